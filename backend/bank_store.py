@@ -0,0 +1,206 @@
+"""
+題庫快取
+每個題庫檔只解析一次，檔案的 mtime 或大小改變時才重建。
+題庫逐行串流解析，一次只保留一題的內容；超過 max_cached_bytes 的大題庫
+不在記憶體中保留題目列表，每次使用時重新串流讀取。
+"""
+
+import io
+import re
+import hashlib
+import threading
+import pathlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# 「### 題號.」行（計數用）與只有「### 題號.」的分隔行（切題用，含行尾換行）
+BANK_HEADING_LINE_RE = re.compile(r'### \d+\.')
+BANK_SPLIT_LINE_RE = re.compile(r'### \d+\.\s*\n')
+# 題目開頭可選的標籤行：<!-- tags: topic=整數運算, difficulty=easy -->
+BANK_TAGS_RE = re.compile(r'<!--\s*tags:(.*?)-->\s*', re.DOTALL)
+BANK_OPTIONS_RE = re.compile(
+    r'\n\s*\(A\)\s*(.*?)\n\s*\(B\)\s*(.*?)\n\s*\(C\)\s*(.*?)\n\s*\(D\)\s*(.*)',
+    re.DOTALL
+)
+
+
+def _parse_bank_block(block: str) -> Optional[dict]:
+    """解析單一題目區塊，格式不符時返回 None"""
+    block = block.strip()
+    if not block:
+        return None
+    tags = None
+    tags_match = BANK_TAGS_RE.match(block)
+    if tags_match:
+        tags = _parse_tags(tags_match.group(1))
+        block = block[tags_match.end():]
+    opt_match = BANK_OPTIONS_RE.search(block)
+    if not opt_match:
+        return None
+    q_text = block[:opt_match.start()].strip()
+    opts = [opt_match.group(i).strip() for i in range(1, 5)]
+    if q_text and len(opts) == 4:
+        q = {"question": q_text, "options": opts}
+        if tags:
+            q["tags"] = tags
+        return q
+    return None
+
+
+def _parse_tags(text: str) -> Dict[str, str]:
+    """解析「key=value, key=value」格式的標籤"""
+    tags = {}
+    for part in text.split(','):
+        key, sep, value = part.partition('=')
+        if sep and key.strip():
+            tags[key.strip()] = value.strip()
+    return tags
+
+
+def iter_bank_lines(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    逐行解析題庫，每解析出一題就產出 {question: str, options: [A,B,C,D]}
+
+    lines 需保留行尾換行字元（如檔案物件）。第一行之後、只有「### 題號.」的行為分隔行，
+    分隔行後的空白行併入分隔，緊接著的下一行不會再被當成分隔行。
+    """
+    block: Optional[List[str]] = None   # 第一個分隔行之前的內容不是題目
+    first = True
+    after_split = False
+    for line in lines:
+        if after_split:
+            if not line.strip():
+                continue
+            after_split = False
+            block.append(line)
+        elif not first and BANK_SPLIT_LINE_RE.fullmatch(line):
+            if block is not None:
+                q = _parse_bank_block(''.join(block))
+                if q is not None:
+                    yield q
+            block = []
+            after_split = True
+        elif block is not None:
+            block.append(line)
+        first = False
+    if block is not None:
+        q = _parse_bank_block(''.join(block))
+        if q is not None:
+            yield q
+
+
+def iter_bank_file(bank_path: pathlib.Path) -> Iterator[dict]:
+    """串流解析題庫檔（記憶體用量只與單題大小有關）"""
+    with open(bank_path, 'r', encoding='utf-8') as f:
+        yield from iter_bank_lines(f)
+
+
+def parse_bank_content(content: str) -> List[dict]:
+    """從題庫內容解析出題目列表，每題為 {question: str, options: [A,B,C,D]}"""
+    return list(iter_bank_lines(io.StringIO(content)))
+
+
+def question_hash(q: dict) -> str:
+    """題庫題目的內容雜湊（題目文字 + 選項），作為跨程序、跨重啟的穩定識別"""
+    parts = [q.get("question", "")] + list(q.get("options", []))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+class _BankEntry:
+    """單一題庫檔的快取內容（questions 為 None 表示題庫太大，不保留題目列表）"""
+
+    __slots__ = ("signature", "questions", "heading_count", "question_count")
+
+    def __init__(
+        self,
+        signature: Tuple[int, int],
+        questions: Optional[List[dict]],
+        heading_count: int,
+        question_count: int,
+    ):
+        self.signature = signature
+        self.questions = questions
+        self.heading_count = heading_count
+        self.question_count = question_count
+
+
+class BankStore:
+    """
+    行程內的題庫快取
+
+    以 (st_mtime_ns, st_size) 作為檔案簽章，簽章不變就直接回傳記憶體中的結果。
+    回傳的題目 dict 為共用物件，呼叫端不可修改。
+    大於 max_cached_bytes 的題庫只快取題數，題目在每次使用時串流讀取。
+    """
+
+    def __init__(self, max_cached_bytes: int = 8 * 1024 * 1024):
+        self.max_cached_bytes = max_cached_bytes
+        self._entries: Dict[pathlib.Path, _BankEntry] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, bank_path: pathlib.Path) -> Optional[_BankEntry]:
+        try:
+            stat = bank_path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(bank_path, None)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(bank_path)
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        heading_count = 0
+        question_count = 0
+        questions: Optional[List[dict]] = [] if stat.st_size <= self.max_cached_bytes else None
+
+        def counted(lines: Iterable[str]) -> Iterator[str]:
+            # 解析的同時計算「### 題號.」行數，不必再讀一次檔案
+            nonlocal heading_count
+            for n, line in enumerate(lines):
+                if n and BANK_HEADING_LINE_RE.match(line):
+                    heading_count += 1
+                yield line
+
+        with open(bank_path, 'r', encoding='utf-8') as f:
+            for q in iter_bank_lines(counted(f)):
+                question_count += 1
+                if questions is not None:
+                    questions.append(q)
+        entry = _BankEntry(signature, questions, heading_count, question_count)
+        with self._lock:
+            self._entries[bank_path] = entry
+        return entry
+
+    def iter_questions(self, bank_path: pathlib.Path) -> Iterator[dict]:
+        """逐題列出題庫題目（已快取時直接走訪，否則串流讀檔）"""
+        entry = self._load(bank_path)
+        if entry is None:
+            return iter(())
+        if entry.questions is not None:
+            return iter(entry.questions)
+        return iter_bank_file(bank_path)
+
+    def get_questions(self, bank_path: pathlib.Path) -> List[dict]:
+        """取得題庫題目列表（回傳新的 list，但題目 dict 為共用）"""
+        return list(self.iter_questions(bank_path))
+
+    def count_questions(self, bank_path: pathlib.Path) -> int:
+        """計算題庫中的題目數量（### 題號 格式）"""
+        entry = self._load(bank_path)
+        if entry is None:
+            return 0
+        return entry.heading_count
+
+    def invalidate(self, bank_path: Optional[pathlib.Path] = None) -> None:
+        """清除快取；未指定路徑時清除全部"""
+        with self._lock:
+            if bank_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(bank_path, None)
+
+
+bank_store = BankStore()
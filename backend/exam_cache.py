@@ -0,0 +1,137 @@
+"""
+考卷解析快取
+以 exam_id + 檔案簽章 (mtime, size) 快取考卷資料（JSON 或 ExamParser 的結果），並預先整理答案表
+"""
+
+import time
+import asyncio
+import threading
+import pathlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from exam_store import load_exam
+
+
+class ParsedExam:
+    """已解析的考卷與預先編好的答案表"""
+
+    __slots__ = ("exam_id", "signature", "data", "answer_key", "checked_at")
+
+    def __init__(self, exam_id: str, signature: Tuple[int, int], data: Dict):
+        self.exam_id = exam_id
+        self.signature = signature
+        self.data = data
+        # 最後一次確認檔案簽章的時間（time.monotonic()）
+        self.checked_at = time.monotonic()
+        # answer_key[題號] -> 答案字母；沒有答案的題號為空字串
+        max_id = max((q['id'] for q in data['questions']), default=0)
+        answer_key: List[str] = [''] * (max_id + 1)
+        for q in data['questions']:
+            answer_key[q['id']] = q.get('correct_answer', '')
+        self.answer_key = answer_key
+
+    def correct_answer(self, question_id: int) -> str:
+        """查詢某題的正確答案"""
+        if 0 <= question_id < len(self.answer_key):
+            return self.answer_key[question_id]
+        return ''
+
+
+class ExamCache:
+    """
+    有容量上限的 LRU 考卷快取
+
+    檔案被改寫（mtime 或大小改變）時自動重新解析；超過容量時淘汰最久未使用的考卷。
+    revalidate_after 秒內確認過的考卷可用 peek() 直接取得，不必再 stat 檔案。
+
+    event loop 上用 load()：只有 peek() 命中（純記憶體）時在 loop 上直接返回；未命中時的 stat、
+    讀檔與解析一律送到專用執行緒（最多 loaders 個）中 get()，磁碟或網路掛載卡住時不會擋住 loop。
+    同一份考卷同時有多個請求未命中時只送出一次 get()，其他請求等待同一個結果、不佔用執行緒。
+    """
+
+    def __init__(self, max_size: int = 128, revalidate_after: float = 1.0, loaders: int = 4):
+        self.max_size = max(1, max_size)
+        self.revalidate_after = revalidate_after
+        self._entries: "OrderedDict[str, ParsedExam]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 讀檔解析多半在等 I/O；執行緒數量不必多，太多只會在 GIL 上和 event loop 互搶
+        self._executor = ThreadPoolExecutor(max_workers=max(1, loaders), thread_name_prefix="exam-cache")
+        # exam_id -> 載入中的 Future（只在 event loop 執行緒上存取）
+        self._inflight: Dict[str, "asyncio.Future[Optional[ParsedExam]]"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, exam_id: str) -> Optional[ParsedExam]:
+        """不做任何 I/O：最近 revalidate_after 秒內確認過的考卷直接返回，否則返回 None"""
+        with self._lock:
+            entry = self._entries.get(exam_id)
+            if entry is None or time.monotonic() - entry.checked_at > self.revalidate_after:
+                return None
+            self._entries.move_to_end(exam_id)
+            self.hits += 1
+            return entry
+
+    async def load(self, exam_id: str, md_file: pathlib.Path) -> Optional[ParsedExam]:
+        """event loop 版本的 get()；檔案不存在或解析失敗時返回 None"""
+        entry = self.peek(exam_id)
+        if entry is not None:
+            return entry
+        future = self._inflight.get(exam_id)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self.get, exam_id, md_file)
+            self._inflight[exam_id] = future
+
+            def finished(done: "asyncio.Future[Optional[ParsedExam]]") -> None:
+                if self._inflight.get(exam_id) is done:
+                    del self._inflight[exam_id]
+
+            future.add_done_callback(finished)
+        # 個別請求被取消（例如連線中斷）時不取消共用的載入
+        return await asyncio.shield(future)
+
+    def get(self, exam_id: str, md_file: pathlib.Path) -> Optional[ParsedExam]:
+        """取得已解析的考卷；檔案不存在或解析失敗時返回 None（會讀檔）"""
+        try:
+            stat = md_file.stat()
+        except FileNotFoundError:
+            self.invalidate(exam_id)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(exam_id)
+            if entry is not None and entry.signature == signature:
+                entry.checked_at = time.monotonic()
+                self._entries.move_to_end(exam_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        data = load_exam(md_file)
+        if not data:
+            return None
+        entry = ParsedExam(exam_id, signature, data)
+
+        with self._lock:
+            self._entries[exam_id] = entry
+            self._entries.move_to_end(exam_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, exam_id: Optional[str] = None) -> None:
+        """清除快取；未指定 exam_id 時清除全部"""
+        with self._lock:
+            if exam_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(exam_id, None)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
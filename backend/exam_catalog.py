@@ -0,0 +1,243 @@
+"""
+考卷目錄索引
+以 SQLite 維護 exams/generated/ 的考卷清單，出題、產生 PDF、刪除時即時更新，
+列表支援分頁與篩選；總數由 trigger 維護的計數表直接讀出，不必掃描目錄。
+在 API 之外產生的 PDF（例如 convert-to-pdf.js 批次轉換）由 refresh_pdfs() 在目錄有變動時補上
+"""
+
+import re
+import time
+import sqlite3
+import pathlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+SUBJECT_FROM_FILENAME = re.compile(r'^exam-(chinese|english|math)-')
+MIXED_FROM_FILENAME = re.compile(r'^mock-exam-.*-comprehensive$')
+
+# 目錄 mtime 的時間精度較粗：剛變動過的目錄不記錄 mtime，下次仍重新掃描，避免漏掉同一刻新增的檔案
+RACY_MTIME_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    exam_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    subject TEXT,
+    created_at TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    has_pdf INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_exams_created ON exams (created_at);
+CREATE INDEX IF NOT EXISTS idx_exams_subject_created ON exams (subject, created_at);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('total_exams', 0), ('total_pdfs', 0);
+
+CREATE TRIGGER IF NOT EXISTS exams_count_insert AFTER INSERT ON exams BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'total_exams';
+    UPDATE counters SET value = value + NEW.has_pdf WHERE name = 'total_pdfs';
+END;
+CREATE TRIGGER IF NOT EXISTS exams_count_delete AFTER DELETE ON exams BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'total_exams';
+    UPDATE counters SET value = value - OLD.has_pdf WHERE name = 'total_pdfs';
+END;
+CREATE TRIGGER IF NOT EXISTS exams_count_pdf AFTER UPDATE OF has_pdf ON exams BEGIN
+    UPDATE counters SET value = value + NEW.has_pdf - OLD.has_pdf WHERE name = 'total_pdfs';
+END;
+"""
+
+
+def subject_from_exam_id(exam_id: str) -> Optional[str]:
+    """由檔名推斷科目（chinese/english/math/mixed），無法判斷時返回 None"""
+    match = SUBJECT_FROM_FILENAME.match(exam_id)
+    if match:
+        return match.group(1)
+    if MIXED_FROM_FILENAME.match(exam_id):
+        return "mixed"
+    return None
+
+
+class ExamCatalog:
+    """考卷目錄（SQLite，每次操作使用獨立連線）"""
+
+    def __init__(self, db_path: pathlib.Path):
+        self.db_path = db_path
+        # 上次 refresh_pdfs() 掃描時的目錄 mtime（st_mtime_ns）
+        self._pdf_scan_mtime: Optional[int] = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_for(md_file: pathlib.Path) -> Tuple:
+        stat = md_file.stat()
+        return (
+            md_file.stem,
+            md_file.name,
+            subject_from_exam_id(md_file.stem),
+            datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            stat.st_size,
+            int(md_file.with_suffix('.pdf').exists()),
+        )
+
+    def upsert(self, md_file: pathlib.Path) -> None:
+        """新增或更新一份考卷（出題、重新產生 PDF 後呼叫）"""
+        with self._connect() as conn:
+            self._upsert(conn, self._row_for(md_file))
+
+    def upsert_many(self, md_files: List[pathlib.Path]) -> None:
+        """一次新增多份考卷（同一個交易）"""
+        rows = [self._row_for(md_file) for md_file in md_files]
+        with self._connect() as conn:
+            for row in rows:
+                self._upsert(conn, row)
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, row: Tuple) -> None:
+        conn.execute(
+            """
+            INSERT INTO exams (exam_id, filename, subject, created_at, file_size, has_pdf)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (exam_id) DO UPDATE SET
+                filename = excluded.filename,
+                subject = excluded.subject,
+                created_at = excluded.created_at,
+                file_size = excluded.file_size,
+                has_pdf = excluded.has_pdf
+            """,
+            row,
+        )
+
+    def set_has_pdf(self, exam_id: str, has_pdf: bool = True) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE exams SET has_pdf = ? WHERE exam_id = ?", (int(has_pdf), exam_id))
+
+    def refresh_pdfs(self, generated_dir: pathlib.Path) -> None:
+        """
+        依磁碟上的 PDF 更新 has_pdf
+
+        新增或刪除檔案會改變目錄的 mtime；mtime 與上次掃描時相同就不必列出目錄。
+        """
+        try:
+            mtime = generated_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._pdf_scan_mtime:
+            return
+        pdfs = [(pdf_file.stem,) for pdf_file in generated_dir.glob("*.pdf")]
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE pdfs (exam_id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO pdfs VALUES (?)", pdfs)
+            conn.execute(
+                """
+                UPDATE exams SET has_pdf = exam_id IN (SELECT exam_id FROM pdfs)
+                WHERE has_pdf != (exam_id IN (SELECT exam_id FROM pdfs))
+                """
+            )
+            conn.execute("DROP TABLE pdfs")
+        if time.time_ns() - mtime > RACY_MTIME_SECONDS * 1e9:
+            self._pdf_scan_mtime = mtime
+
+    def remove(self, exam_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM exams WHERE exam_id = ?", (exam_id,))
+
+    def rebuild(self, generated_dir: pathlib.Path) -> int:
+        """依磁碟上的檔案重建索引（新增缺少的、更新變動的、移除已不存在的），返回考卷數"""
+        rows = []
+        if generated_dir.exists():
+            for md_file in generated_dir.glob("*.md"):
+                try:
+                    rows.append(self._row_for(md_file))
+                except FileNotFoundError:
+                    continue
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE seen (exam_id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT INTO seen VALUES (?)", [(r[0],) for r in rows])
+            conn.execute("DELETE FROM exams WHERE exam_id NOT IN (SELECT exam_id FROM seen)")
+            for row in rows:
+                self._upsert(conn, row)
+            conn.execute("DROP TABLE seen")
+        return len(rows)
+
+    def query(
+        self,
+        subject: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict], int]:
+        """
+        列出考卷（最新的在前）
+
+        Args:
+            subject: chinese/english/math/mixed
+            date_from, date_to: YYYY-MM-DD（含當日）
+            limit, offset: 分頁；limit 為 None 時不分頁
+
+        Returns:
+            (考卷列表, 符合條件的總數)
+        """
+        where, params = [], []
+        if subject:
+            where.append("subject = ?")
+            params.append(subject)
+        if date_from:
+            where.append("created_at >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("created_at < date(?, '+1 day')")
+            params.append(date_to)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self._connect() as conn:
+            if where:
+                total = conn.execute(f"SELECT COUNT(*) FROM exams {where_sql}", params).fetchone()[0]
+            else:
+                total = self.counts(conn)["total_exams"]
+            rows = conn.execute(
+                f"""
+                SELECT exam_id, filename, subject, created_at, file_size, has_pdf
+                FROM exams {where_sql}
+                ORDER BY created_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                params + [limit if limit is not None else -1, offset],
+            ).fetchall()
+
+        items = [
+            {
+                "exam_id": exam_id,
+                "filename": filename,
+                "subject": subj,
+                "created_at": created_at,
+                "file_size": file_size,
+                "has_pdf": bool(has_pdf),
+            }
+            for exam_id, filename, subj, created_at, file_size, has_pdf in rows
+        ]
+        return items, total
+
+    def counts(self, conn: Optional[sqlite3.Connection] = None) -> Dict[str, int]:
+        """考卷總數與 PDF 總數（讀計數表，O(1)）"""
+        if conn is None:
+            with self._connect() as conn:
+                return self.counts(conn)
+        rows = conn.execute("SELECT name, value FROM counters").fetchall()
+        return {name: value for name, value in rows}
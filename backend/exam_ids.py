@@ -0,0 +1,56 @@
+"""
+考卷編號
+ULID 格式：48 位元毫秒時間戳 + 80 位元隨機數，以 Crockford Base32 編成 26 字元。
+依字串排序即為產生順序；同一毫秒內隨機部分遞增，程序內嚴格單調遞增。
+不同 worker 程序之間靠 80 位元隨機數避免重複，不需要任何鎖檔或共用計數器。
+"""
+
+import os
+import time
+import threading
+
+
+CROCKFORD_BASE32 = "0123456789abcdefghjkmnpqrstvwxyz"
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(CROCKFORD_BASE32[index])
+    return "".join(reversed(chars))
+
+
+class UlidGenerator:
+    """產生單調遞增的 ULID（小寫，適合用在檔名）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self) -> str:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                # 同一毫秒（或系統時間倒退）：沿用上一個時間戳，隨機部分加一
+                ms = self._last_ms
+                random_part = self._last_random + 1
+                if random_part > RANDOM_MAX:
+                    ms += 1
+                    random_part = int.from_bytes(os.urandom(10), "big")
+            else:
+                random_part = int.from_bytes(os.urandom(10), "big")
+            self._last_ms = ms
+            self._last_random = random_part
+        return _encode(ms, 10) + _encode(random_part, 16)
+
+
+_generator = UlidGenerator()
+
+
+def new_ulid() -> str:
+    """產生新的 ULID（執行緒安全）"""
+    return _generator.new()
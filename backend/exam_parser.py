@@ -4,12 +4,31 @@
 """
 
 import re
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Optional
 from pathlib import Path
 
 
+# 預先編譯的樣式（與逐行比對時使用）
+TITLE_RE = re.compile(r'^#\s+(.+)')
+SUBJECT_HEADER_RE = re.compile(r'##\s+[一二三四五六七八九十]、(.+科)')
+QUESTION_RE = re.compile(r'^(\d+)\.\s+(.+)')
+QUESTION_START_RE = re.compile(r'^\d+\.')
+OPTION_RE = re.compile(r'^\s*\(([A-D])\)\s+(.+)')
+QUESTION_SECTION_END_RE = re.compile(r'##\s+參考答案|###\s+.*答案')
+ANSWER_SECTION_RE = re.compile(r'##\s+參考答案')
+ANSWER_ROW_RE = re.compile(r'\|\s*(\d+)\s*\|\s*\(([A-D])\)')
+
+# 判斷科目時只看考卷開頭的字數
+SUBJECT_HEAD_CHARS = 500
+
+
 class ExamParser:
-    """考卷解析器"""
+    """
+    考卷解析器
+
+    單次逐行掃描：標題、科目標題、題目、選項、答案表都在同一趟中處理，
+    每行只比對必要的預編譯樣式。
+    """
     
     def __init__(self, markdown_content: str):
         self.content = markdown_content
@@ -38,14 +57,112 @@ class ExamParser:
             ]
         }
         """
-        # 解析標題
-        title = self._extract_title()
+        return self.parse_lines(self.content.split('\n'))
+    
+    def parse_lines(self, lines: Iterable[str]) -> Dict:
+        """解析逐行輸入的考卷（行尾換行字元可有可無）"""
+        title = None
+        title_pending = False   # 遇到只有「#」的行：標題是下一個非空白行
+        head_parts = []
+        head_len = 0
+        
+        in_questions = True     # 尚未遇到答案區標題
+        in_answers = False      # 已進入「## 參考答案」之後
+        current_subject = "綜合科"
+        current = None          # 正在收集選項的題目：[id, 題目文字, 選項列表]
+        answer_parts = []       # 答案區內容（表格列可能跨行，最後一次比對）
+        
+        for line in lines:
+            line = line.rstrip('\r\n')
+            
+            # 考卷開頭（判斷科目用）
+            if head_len < SUBJECT_HEAD_CHARS:
+                head_parts.append(line)
+                head_len += len(line) + 1
+            
+            # 標題：第一個「# 」開頭的行
+            if title is None:
+                if title_pending:
+                    if line.strip():
+                        title = line.strip()
+                elif line[:1] == '#':
+                    if not line[1:].strip():
+                        title_pending = True
+                    else:
+                        title_match = TITLE_RE.match(line)
+                        if title_match:
+                            title = title_match.group(1).strip()
+            
+            if in_answers:
+                answer_parts.append(line)
+                continue
+            
+            # 兩種答案區標題都含有「##」，先用字串判斷省去大部分的 regex
+            if '##' in line:
+                answer_match = ANSWER_SECTION_RE.search(line)
+                if answer_match:
+                    in_answers = True
+                    answer_parts.append(line[answer_match.end():])
+                if not in_questions:
+                    continue
+                # 題目區到「參考答案」或「### ...答案」為止；標題之前的部分仍屬題目區
+                end_match = QUESTION_SECTION_END_RE.search(line)
+                if end_match:
+                    in_questions = False
+                    line = line[:end_match.start()]
+            elif not in_questions:
+                continue
+            
+            if current is not None:
+                # 正在收集選項（選項前面可能有空格縮排）
+                stripped = line.strip()
+                if not stripped:
+                    # 空行：選項之間的空行直接略過
+                    continue
+                option_match = OPTION_RE.match(line)
+                if option_match:
+                    options = current[2]
+                    options.append({
+                        'label': option_match.group(1),
+                        'text': option_match.group(2).strip()
+                    })
+                    # 已經收集到 4 個選項，結束
+                    if len(options) >= 4:
+                        self._finish_question(current, current_subject)
+                        current = None
+                    continue
+                if stripped[0] == '#' or QUESTION_START_RE.match(stripped):
+                    # 遇到新的標題或新的題目：結束這題，這行交給下面重新判斷
+                    self._finish_question(current, current_subject)
+                    current = None
+                else:
+                    # 其他情況：可能是題目的延續
+                    if not current[2]:
+                        current[1] += ' ' + stripped
+                    continue
+            
+            if not line:
+                continue
+            first = line[0]
+            if first == '#':
+                # 檢測科目標題（保留中文數字）
+                subject_match = SUBJECT_HEADER_RE.match(line)
+                if subject_match:
+                    current_subject = subject_match.group(1)
+            elif '0' <= first <= '9':
+                # 檢測題目開頭（數字. 開頭）
+                question_match = QUESTION_RE.match(line)
+                if question_match:
+                    # 移除 <br> 標籤
+                    q_text = question_match.group(2).replace('<br>', '').strip()
+                    current = [int(question_match.group(1)), q_text, []]
         
-        # 解析題目
-        self._parse_questions()
+        if current is not None:
+            self._finish_question(current, current_subject)
         
-        # 解析答案
-        self._parse_answers()
+        # 解析答案區：表格中的 | 題號 | (答案) |
+        for match in ANSWER_ROW_RE.finditer('\n'.join(answer_parts)):
+            self.answers[int(match.group(1))] = match.group(2)
         
         # 合併題目和答案
         for q in self.questions:
@@ -54,139 +171,41 @@ class ExamParser:
                 q['correct_answer'] = self.answers[q_id]
         
         # 判斷科目（如果是綜合卷，根據題目數量判斷）
-        subject = self._determine_subject()
+        subject = self._determine_subject('\n'.join(head_parts)[:SUBJECT_HEAD_CHARS])
         
         return {
-            'title': title,
+            'title': title if title is not None else "模擬考試",
             'subject': subject,
             'questions': self.questions,
             'total_questions': len(self.questions)
         }
     
-    def _extract_title(self) -> str:
-        """提取標題"""
-        match = re.search(r'^#\s+(.+)', self.content, re.MULTILINE)
-        if match:
-            return match.group(1).strip()
-        return "模擬考試"
+    def _finish_question(self, current, subject: str) -> None:
+        """確保有 4 個選項才加入"""
+        q_id, q_text, options = current
+        if len(options) == 4:
+            self.questions.append({
+                'id': q_id,
+                'subject': subject,
+                'question': q_text,
+                'options': options
+            })
     
-    def _determine_subject(self) -> str:
-        """判斷科目"""
-        if '國語' in self.content[:500]:
-            if '英語' in self.content[:500] or '數學' in self.content[:500]:
+    @staticmethod
+    def _determine_subject(head: str) -> str:
+        """判斷科目（只看考卷開頭）"""
+        has_chinese = '國語' in head
+        has_english = '英語' in head
+        has_math = '數學' in head
+        if has_chinese:
+            if has_english or has_math:
                 return "綜合科"
             return "國語科"
-        elif '英語' in self.content[:500] or 'English' in self.content[:500]:
+        elif has_english or 'English' in head:
             return "英語科"
-        elif '數學' in self.content[:500]:
+        elif has_math:
             return "數學科"
         return "綜合科"
-    
-    def _parse_questions(self):
-        """解析題目區"""
-        # 找到題目區（在 "參考答案" 或 "### 答案" 之前的內容）
-        question_section = re.split(r'##\s+參考答案|###\s+.*答案', self.content)[0]
-        
-        current_subject = "綜合科"
-        
-        # 更精確的解析方式
-        lines = question_section.split('\n')
-        i = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            
-            # 檢測科目標題（保留中文數字）
-            if re.match(r'##\s+[一二三四五六七八九十]、(.+科)', line):
-                subject_match = re.search(r'##\s+[一二三四五六七八九十]、(.+科)', line)
-                if subject_match:
-                    current_subject = subject_match.group(1)
-                i += 1
-                continue
-            
-            # 檢測題目開頭（數字. 開頭，但要小心縮排）
-            # 題目可能有縮排空格
-            question_match = re.match(r'^(\d+)\.\s+(.+)', line)
-            if question_match:
-                q_id = int(question_match.group(1))
-                q_text = question_match.group(2)
-                
-                # 移除 <br> 標籤
-                q_text = q_text.replace('<br>', '').strip()
-                
-                # 向下查找選項（選項前面可能有空格縮排）
-                i += 1
-                options = []
-                
-                while i < len(lines):
-                    # 不要 strip，保留原始格式以檢查縮排
-                    option_line = lines[i]
-                    option_line_stripped = option_line.strip()
-                    
-                    # 如果是空行，跳過
-                    if not option_line_stripped:
-                        i += 1
-                        # 空行可能代表選項結束
-                        if len(options) >= 4:
-                            break
-                        continue
-                    
-                    # 匹配選項 (A) ... 或 (B) ... 等（允許前面有空格）
-                    option_match = re.match(r'^\s*\(([A-D])\)\s+(.+)', option_line)
-                    if option_match:
-                        label = option_match.group(1)
-                        text = option_match.group(2).strip()
-                        options.append({
-                            'label': label,
-                            'text': text
-                        })
-                        i += 1
-                        
-                        # 如果已經收集到 4 個選項，結束
-                        if len(options) >= 4:
-                            break
-                    elif option_line_stripped.startswith('#'):
-                        # 遇到新的標題，結束
-                        break
-                    elif re.match(r'^\d+\.', option_line_stripped):
-                        # 遇到新的題目，結束
-                        break
-                    else:
-                        # 其他情況：可能是題目的延續
-                        if not options:
-                            q_text += ' ' + option_line_stripped
-                        i += 1
-                
-                # 確保有 4 個選項才加入
-                if len(options) == 4:
-                    self.questions.append({
-                        'id': q_id,
-                        'subject': current_subject,
-                        'question': q_text,
-                        'options': options
-                    })
-                # 不要 continue，讓 i 保持在當前位置
-                continue
-            
-            i += 1
-    
-    def _parse_answers(self):
-        """解析答案區（從表格中提取）"""
-        # 找到答案區
-        answer_section_match = re.search(r'##\s+參考答案(.+?)$', self.content, re.DOTALL)
-        if not answer_section_match:
-            return
-        
-        answer_section = answer_section_match.group(1)
-        
-        # 匹配表格中的答案行
-        # 格式: | 1 | (B) | 2.5 | ...
-        pattern = r'\|\s*(\d+)\s*\|\s*\(([A-D])\)'
-        
-        for match in re.finditer(pattern, answer_section):
-            q_id = int(match.group(1))
-            answer = match.group(2)
-            self.answers[q_id] = answer
 
 
 def parse_exam_file(file_path: Path) -> Optional[Dict]:
@@ -200,11 +219,9 @@ def parse_exam_file(file_path: Path) -> Optional[Dict]:
         考卷資料字典，如果解析失敗則返回 None
     """
     try:
+        # 逐行讀檔解析，不必先把整份考卷讀成字串
         with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        parser = ExamParser(content)
-        return parser.parse()
+            return ExamParser('').parse_lines(f)
     except Exception as e:
         print(f"解析考卷失敗: {e}")
         import traceback
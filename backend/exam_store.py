@@ -0,0 +1,121 @@
+"""
+考卷結構化存檔
+出題時在 Markdown 旁另存一份 JSON（題目、選項、科目、答案），讀取時直接載入，
+只有舊考卷或手寫考卷（沒有 JSON，或 JSON 比 Markdown 舊）才交給 ExamParser 解析
+"""
+
+import os
+import json
+import stat
+import pathlib
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from exam_parser import parse_exam_file
+
+
+SIDECAR_VERSION = 1
+OPTION_LABELS = ["A", "B", "C", "D"]
+
+# 程序的 umask（只能以設定再還原的方式讀取，啟動時讀一次，避免和其他執行緒互搶）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def sidecar_path(md_file: pathlib.Path) -> pathlib.Path:
+    """考卷 Markdown 對應的 JSON 路徑"""
+    return md_file.with_suffix(".json")
+
+
+def _flatten_text(text: str) -> str:
+    """與 ExamParser 相同：多行題目以空白接成一行"""
+    return " ".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+def build_exam_record(
+    title: str,
+    subject: str,
+    sections: List[Tuple[str, List[dict]]],
+) -> Dict:
+    """
+    組出與 ExamParser.parse() 相同格式的考卷資料
+
+    Args:
+        title: 考卷標題
+        subject: 考卷科目（如「數學科」「綜合科」）
+        sections: [(科目名稱, 題目列表), ...]，題號依序連續編排
+    """
+    questions = []
+    q_id = 1
+    for section_subject, section_questions in sections:
+        for q in section_questions:
+            questions.append({
+                "id": q_id,
+                "subject": section_subject,
+                "question": _flatten_text(q.get("question", "")),
+                "options": [
+                    {"label": label, "text": str(text).strip()}
+                    for label, text in zip(OPTION_LABELS, q.get("options", []))
+                ],
+                "correct_answer": q.get("correct_answer", "A"),
+            })
+            q_id += 1
+    return {
+        "version": SIDECAR_VERSION,
+        "title": title,
+        "subject": subject,
+        "questions": questions,
+        "total_questions": len(questions),
+    }
+
+
+def atomic_write_text(path: pathlib.Path, text: str) -> None:
+    """
+    先寫入同目錄的暫存檔再改名取代，其他執行緒或 worker 不會讀到寫到一半的檔案
+
+    失敗時刪除暫存檔，原有檔案維持不變。
+    mkstemp 建立的暫存檔權限是 0600；改名前改成原檔案的權限（沒有原檔案時依 umask，與 write_text 相同），
+    nginx、PDF 服務等其他使用者才讀得到。
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            try:
+                mode = stat.S_IMODE(path.stat().st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.fchmod(f.fileno(), mode)
+        os.replace(tmp, path)
+    except BaseException:
+        pathlib.Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_exam_sidecar(md_file: pathlib.Path, record: Dict) -> None:
+    """寫入考卷 JSON（需在 Markdown 寫入之後呼叫，確保 JSON 不會比 Markdown 舊）"""
+    atomic_write_text(
+        sidecar_path(md_file),
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")),
+    )
+
+
+def load_exam(md_file: pathlib.Path) -> Optional[Dict]:
+    """
+    載入考卷資料：優先使用 JSON，沒有（或已過期）時解析 Markdown
+
+    Returns:
+        考卷資料字典，如果解析失敗則返回 None
+    """
+    json_file = sidecar_path(md_file)
+    try:
+        if json_file.stat().st_mtime_ns >= md_file.stat().st_mtime_ns:
+            with open(json_file, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            if record.get("version") == SIDECAR_VERSION:
+                return record
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"考卷 JSON 讀取失敗，改為解析 Markdown: {e}")
+    return parse_exam_file(md_file)
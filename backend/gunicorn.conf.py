@@ -0,0 +1,34 @@
+"""
+Gunicorn 設定：多個 uvicorn worker 同時處理請求
+
+使用方式（在 backend/ 目錄）：
+    gunicorn -c gunicorn.conf.py main:app
+
+環境變數：
+    BACKEND_WORKERS   worker 程序數（預設為 CPU 核心數）
+    BACKEND_BIND      監聽位址（預設 0.0.0.0:8000）
+
+多個 worker 時的共用狀態：
+- 考卷目錄、背景工作、變型池、學生出題紀錄都在 exams/*.db（SQLite WAL），每個 worker 讀寫同一份
+- 題庫快取與已解析考卷快取是各 worker 自己的記憶體快取（不是共用儲存），代價：
+  - 記憶體：N 個 worker 就有 N 份已解析的題庫，以及各自最多 EXAM_CACHE_SIZE 份已解析考卷
+  - 一致性：題庫每次使用前都比對檔案的 mtime 與大小；已解析考卷在 EXAM_CACHE_REVALIDATE 秒內
+    不重新檢查檔案，所以考卷被改寫或刪除後，其他 worker 最多有這麼久仍使用舊內容
+- 變型池背景補充只由取得 exams/variant_refiller.lock 的那個 worker 執行
+- 考卷檔名使用 ULID（exam_ids.py），同時出題也不會撞名
+"""
+
+import os
+import multiprocessing
+
+bind = os.getenv("BACKEND_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("BACKEND_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# 出題（LLM 改寫）與 PDF 轉換可能超過預設的 30 秒
+timeout = int(os.getenv("PDF_TIMEOUT", "120")) + 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,219 @@
+"""
+背景出題工作佇列
+送出後立即返回 job_id，由執行緒池執行出題，前端輪詢進度。
+工作狀態存在 SQLite，多個 worker 程序時任何一個都查得到（工作在送出的那個程序中執行）。
+"""
+
+import os
+import json
+import uuid
+import socket
+import sqlite3
+import pathlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    instance_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_instances (
+    instance_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at TEXT NOT NULL
+);
+"""
+
+FIELDS = (
+    "job_id", "kind", "status", "progress_done", "progress_total",
+    "result", "error", "created_at", "updated_at", "instance_id",
+)
+
+ORPHANED_ERROR = "執行此工作的程序已結束"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """
+    背景工作管理
+
+    - max_workers：本程序同時執行的出題工作數
+    - max_jobs：保留的工作紀錄上限，超過時先淘汰最舊的已結束工作
+    - 每個程序有自己的 instance_id（建立時產生），start() 時登記在 job_instances，送出的工作記下它；
+      查詢時工作的 instance 已不在登記中（或同一主機上該 pid 已結束）就把未完成的工作標為失敗
+    - 只看 pid 不夠：容器中後端重啟後通常拿到同一個 pid（常是 1），上一次執行留下的工作會一直像是還在跑。
+      所以 start() 會移除同一主機上 pid 與自己相同或已結束的舊 instance，並把不屬於任何登記中 instance
+      的未完成工作標為失敗
+    """
+
+    def __init__(self, db_path: pathlib.Path, max_workers: int = 2, max_jobs: int = 500):
+        self.db_path = db_path
+        self.max_jobs = max_jobs
+        self.instance_id = uuid.uuid4().hex
+        self.host = socket.gethostname()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "instance_id" not in columns:
+                # 舊資料庫：之前的工作沒有 instance_id，start() 時會被視為已結束
+                conn.execute("ALTER TABLE jobs ADD COLUMN instance_id TEXT")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exam-job")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def start(self) -> int:
+        """登記本程序的 instance，並把已結束程序留下的未完成工作標為失敗；返回標為失敗的工作數"""
+        pid = os.getpid()
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT instance_id, pid FROM job_instances WHERE host = ?", (self.host,)
+            ).fetchall()
+            stale = [(instance_id,) for instance_id, other_pid in rows if other_pid == pid or not _pid_alive(other_pid)]
+            conn.executemany("DELETE FROM job_instances WHERE instance_id = ?", stale)
+            conn.execute(
+                "INSERT OR REPLACE INTO job_instances (instance_id, host, pid, started_at) VALUES (?, ?, ?, ?)",
+                (self.instance_id, self.host, pid, now),
+            )
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = 'failed', error = ?, updated_at = ?
+                WHERE status IN ('queued', 'running')
+                  AND (instance_id IS NULL OR instance_id NOT IN (SELECT instance_id FROM job_instances))
+                """,
+                (ORPHANED_ERROR, now),
+            )
+            return cursor.rowcount
+
+    def _instance_alive(self, conn: sqlite3.Connection, instance_id: Optional[str]) -> bool:
+        if instance_id == self.instance_id:
+            return True
+        row = conn.execute(
+            "SELECT host, pid FROM job_instances WHERE instance_id = ?", (instance_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        host, pid = row
+        if host != self.host:
+            # 其他主機的程序無法檢查 pid，以登記為準
+            return True
+        return pid != os.getpid() and _pid_alive(pid)
+
+    def submit(self, kind: str, fn: Callable[..., dict], *args) -> str:
+        """
+        送出工作並返回 job_id；fn 會以 fn(*args, on_progress=callback) 呼叫，需返回結果 dict
+        """
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO jobs (job_id, kind, status, created_at, updated_at, pid, instance_id)
+                VALUES (?, ?, 'queued', ?, ?, ?, ?)
+                """,
+                (job_id, kind, now, now, os.getpid(), self.instance_id),
+            )
+            self._evict(conn)
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            DELETE FROM jobs WHERE job_id IN (
+                SELECT job_id FROM jobs WHERE status IN ('done', 'failed')
+                ORDER BY created_at
+                LIMIT max(0, (SELECT COUNT(*) FROM jobs) - ?)
+            )
+            """,
+            (self.max_jobs,),
+        )
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.now().isoformat()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                list(fields.values()) + [job_id],
+            )
+
+    def _run(self, job_id: str, fn: Callable[..., dict], args: tuple) -> None:
+        self._update(job_id, status="running")
+
+        def on_progress(done: int, total: int) -> None:
+            self._update(job_id, progress_done=done, progress_total=total)
+
+        try:
+            result = fn(*args, on_progress=on_progress)
+        except Exception as e:
+            print(f"背景出題失敗 ({job_id}): {e}")
+            self._update(job_id, status="failed", error=str(e))
+            return
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'done', result = ?, progress_done = progress_total, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (json.dumps(result, ensure_ascii=False), datetime.now().isoformat(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """取得工作狀態；不存在時返回 None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = dict(zip(FIELDS, row))
+            alive = self._instance_alive(conn, job.pop("instance_id"))
+        if job["status"] in ("queued", "running") and not alive:
+            job["status"] = "failed"
+            job["error"] = ORPHANED_ERROR
+            self._update(job_id, status="failed", error=job["error"])
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def shutdown(self) -> None:
+        """停止執行緒池並取消登記；本程序未完成的工作之後查詢時會標為失敗"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_instances WHERE instance_id = ?", (self.instance_id,))
@@ -5,17 +5,27 @@ FastAPI Backend for Mock Exam Tutor
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Callable, List, Optional
 import os
 import re
 import json
 import random
 from datetime import datetime
-import subprocess
 import pathlib
-from exam_parser import parse_exam_file
+from bank_store import bank_store
+from exam_cache import ExamCache
+from exam_store import atomic_write_text, build_exam_record, write_exam_sidecar, sidecar_path
+from exam_ids import new_ulid
+from exam_catalog import ExamCatalog
+from variation import VariationEngine
+from variant_pool import VariantPool, VariantRefiller, is_valid_variant
+from jobs import JobManager
+from sampling import ExamSampler, SampleHistory, make_rng
+from pdf_service import PdfService, PdfRenderError, PdfServiceBusy
+from quiz_sessions import QuizSessionStore, SessionError, format_signature
 from dotenv import load_dotenv
 
 # 載入環境變數
@@ -51,6 +61,23 @@ try:
 except ImportError:
     openai_client = None
 
+# LLM 改寫的併發數與逐題逾時（秒）
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# 每次 LLM 呼叫合併改寫的題數（1 = 每題一次呼叫）
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+# 單題呼叫的輸出 token 上限；批次呼叫每題約需 LLM_TOKENS_PER_QUESTION，合計不超過 LLM_MAX_TOKENS
+LLM_SINGLE_MAX_TOKENS = 1000
+LLM_TOKENS_PER_QUESTION = 300
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "8000"))
+
+# 變型池：每題預先保留的變型數（0 表示不啟動背景補充）、補充時每次 LLM 呼叫的間隔秒數
+VARIANT_POOL_TARGET = int(os.getenv("VARIANT_POOL_TARGET", "3"))
+VARIANT_POOL_REFILL_DELAY = float(os.getenv("VARIANT_POOL_REFILL_DELAY", "4"))
+
+# 指定 student_id 出題時，避開該學生最近幾份考卷出過的題目
+STUDENT_HISTORY_EXAMS = int(os.getenv("STUDENT_HISTORY_EXAMS", "3"))
+
 app = FastAPI(title="Mock Exam Tutor API", version="1.0.0")
 
 # 允許前端跨域請求
@@ -70,6 +97,40 @@ GENERATED_DIR = EXAMS_DIR / "generated"
 TEMPLATES_DIR = EXAMS_DIR / "templates"
 IMAGES_DIR = EXAMS_DIR / "images"
 
+# 已解析考卷快取（同一份考卷被全班讀取/交卷時不必重複解析）
+exam_cache = ExamCache(
+    max_size=int(os.getenv("EXAM_CACHE_SIZE", "128")),
+    revalidate_after=float(os.getenv("EXAM_CACHE_REVALIDATE", "1")),
+)
+
+# 考卷目錄索引（列表、統計不必每次掃描 exams/generated/）
+exam_catalog = ExamCatalog(EXAMS_DIR / "catalog.db")
+
+# 背景出題工作（送出後立即返回 job_id，前端輪詢進度；狀態存在 SQLite，多個 worker 共用）
+job_manager = JobManager(EXAMS_DIR / "jobs.db", max_workers=int(os.getenv("JOB_WORKERS", "2")))
+
+# 預先產生的 LLM 變型題（SQLite，重啟後仍保留）
+variant_pool = VariantPool(EXAMS_DIR / "variant_pool.db")
+
+# PDF 轉換：常駐的 Node 服務（瀏覽器與 MathJax 只啟動一次）
+pdf_service = PdfService(
+    BASE_DIR / "scripts",
+    port=int(os.getenv("PDF_SERVICE_PORT", "3100")),
+    autostart=os.getenv("PDF_SERVICE_AUTOSTART", "true").lower() == "true",
+    timeout=float(os.getenv("PDF_TIMEOUT", "120")),
+)
+
+# 答題階段：開卷時建立、交卷時核對考卷版本並防止重複交卷（SQLite，多個 worker 共用）
+quiz_sessions = QuizSessionStore(
+    EXAMS_DIR / "quiz_sessions.db",
+    ttl=float(os.getenv("QUIZ_SESSION_TTL", "10800")),
+    max_sessions=int(os.getenv("QUIZ_SESSION_MAX", "50000")),
+)
+
+# 抽題（水庫／分層抽樣）與學生出題紀錄
+exam_sampler = ExamSampler(bank_store)
+sample_history = SampleHistory(EXAMS_DIR / "sample_history.db")
+
 # ==================== 資料模型 ====================
 
 class ExamRequest(BaseModel):
@@ -77,12 +138,30 @@ class ExamRequest(BaseModel):
     subject: str  # "chinese", "english", "math", "mixed"
     num_questions: int
     difficulty: Optional[str] = "medium"  # "easy", "medium", "hard"
+    student_id: Optional[str] = None  # 指定時避開該學生近期考卷出過的題目
+    seed: Optional[int] = None  # 指定時抽題結果可重現
+    stratify_by: Optional[str] = None  # 依題庫標籤分層抽樣，如 "topic"、"difficulty"
     
 class MixedExamRequest(BaseModel):
     """綜合考題請求"""
     chinese_count: int = 0
     english_count: int = 0
     math_count: int = 0
+    student_id: Optional[str] = None
+    seed: Optional[int] = None
+    stratify_by: Optional[str] = None  # 各科分別依此標籤分層抽樣
+    
+class BulkExamRequest(BaseModel):
+    """整班出題請求：一次產生多份不同的考卷"""
+    subject: str  # "chinese", "english", "math", "mixed"
+    num_questions: int = 0  # 單科卷題數
+    chinese_count: int = 0  # 綜合卷各科題數
+    english_count: int = 0
+    math_count: int = 0
+    count: int = 0  # 份數（未提供 student_ids 時使用）
+    student_ids: Optional[List[str]] = None  # 每位學生一份，並避開各自近期考過的題目
+    seed: Optional[int] = None  # 指定時整批結果可重現
+    stratify_by: Optional[str] = None  # 綜合卷時各科分別分層抽樣
     
 class ExamResponse(BaseModel):
     """出題回應"""
@@ -91,6 +170,18 @@ class ExamResponse(BaseModel):
     total_questions: int
     created_at: str
     download_url: Optional[str] = None
+
+class JobStatus(BaseModel):
+    """背景出題工作狀態"""
+    job_id: str
+    kind: str
+    status: str  # "queued", "running", "done", "failed"
+    progress_done: int
+    progress_total: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
     
 class ExamListItem(BaseModel):
     """考卷清單項目"""
@@ -99,6 +190,7 @@ class ExamListItem(BaseModel):
     created_at: str
     file_size: int
     has_pdf: bool
+    subject: Optional[str] = None  # "chinese", "english", "math", "mixed"
 
 class QuestionOption(BaseModel):
     """選項"""
@@ -120,6 +212,8 @@ class ExamForQuiz(BaseModel):
     subject: str
     questions: List[Question]
     total_questions: int
+    session_id: str  # 交卷時帶回
+    expires_at: str
 
 class QuizAnswer(BaseModel):
     """答題記錄"""
@@ -130,6 +224,7 @@ class SubmitQuizRequest(BaseModel):
     """提交答案請求"""
     exam_id: str
     answers: List[QuizAnswer]
+    session_id: Optional[str] = None  # 開卷時取得；交卷必填，未提供時返回 400
 
 class QuizResult(BaseModel):
     """答題結果"""
@@ -139,6 +234,7 @@ class QuizResult(BaseModel):
     correct_count: int
     score: int
     answers: List[dict]
+    session_id: str
 
 # ==================== 輔助函數 ====================
 
@@ -153,63 +249,43 @@ def get_subject_bank_path(subject: str) -> pathlib.Path:
 
 def count_questions_in_bank(subject: str) -> int:
     """計算題庫中的題目數量（### 題號 格式）"""
-    bank_path = get_subject_bank_path(subject)
-    if not bank_path.exists():
-        return 0
-    with open(bank_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    return len(re.findall(r'\n### \d+\.', content))
+    return bank_store.count_questions(get_subject_bank_path(subject))
 
 
-def _parse_bank_questions(bank_path: pathlib.Path) -> List[dict]:
-    """從題庫檔解析出題目列表，每題為 {question: str, options: [A,B,C,D]}"""
-    if not bank_path.exists():
-        return []
-    with open(bank_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    questions = []
-    blocks = re.split(r'\n### \d+\.\s*\n', content)
-    for block in blocks[1:]:
-        block = block.strip()
-        if not block:
-            continue
-        opt_match = re.search(
-            r'\n\s*\(A\)\s*(.*?)\n\s*\(B\)\s*(.*?)\n\s*\(C\)\s*(.*?)\n\s*\(D\)\s*(.*)',
-            block, re.DOTALL
-        )
-        if not opt_match:
-            continue
-        q_text = block[:opt_match.start()].strip()
-        opts = [opt_match.group(i).strip() for i in range(1, 5)]
-        if q_text and len(opts) == 4:
-            questions.append({"question": q_text, "options": opts})
-    return questions
-
-
-def _sample_from_bank(subject: str, num_questions: int) -> List[dict]:
-    """從題庫隨機抽題。若題庫不足則重複使用。"""
-    bank_path = get_subject_bank_path(subject)
-    all_q = _parse_bank_questions(bank_path)
-    if not all_q:
-        return []
-    if num_questions <= len(all_q):
-        chosen = random.sample(all_q, num_questions)
-    else:
-        result = list(all_q)
-        while len(result) < num_questions:
-            result.append(random.choice(all_q))
-        chosen = result[:num_questions]
-    # 每題做變型：選項重排 + 數學可做數字變換
-    return [_apply_variation(q, subject) for q in chosen]
+def _pick_from_bank(
+    subject: str,
+    num_questions: int,
+    rng: Optional[random.Random] = None,
+    student_id: Optional[str] = None,
+    stratify_by: Optional[str] = None,
+) -> List[dict]:
+    """
+    從題庫隨機抽題（不做變型）。同一份考卷內不重複，題庫不足時才整輪重複使用；
+    指定 student_id 時優先避開該學生最近 STUDENT_HISTORY_EXAMS 份考卷出過的題目。
+    """
+    recent = sample_history.recent(student_id, subject, STUDENT_HISTORY_EXAMS) if student_id else None
+    return exam_sampler.sample(
+        get_subject_bank_path(subject),
+        num_questions,
+        rng=rng,
+        recent=recent,
+        stratify_by=stratify_by,
+    )
 
 
-def _rewrite_question_with_llm(q: dict, subject: str) -> dict:
-    """用 LLM 改寫題目：同概念、同難度，但新措辭、新數字、新情境。"""
+def _record_student_history(student_id: Optional[str], filename: str, jobs: List[tuple]) -> None:
+    """記錄學生這份考卷用到的題庫原題（jobs 為 (原題, 科目)）"""
+    if student_id:
+        sample_history.record(student_id, pathlib.Path(filename).stem, jobs)
+
+
+def _build_rewrite_prompt(q: dict, subject: str) -> str:
+    """組出單題改寫的 prompt"""
     subject_label = {"chinese": "國語", "english": "英語", "math": "數學"}[subject]
     q_text = q.get("question", "")
     opts = q.get("options", [])
     
-    prompt = f"""你是私立國中入學考題的出題專家。請將以下題目「改寫/變型」：
+    return f"""你是私立國中入學考題的出題專家。請將以下題目「改寫/變型」：
 
 **原題**（{subject_label}科）：
 {q_text}
@@ -232,81 +308,204 @@ def _rewrite_question_with_llm(q: dict, subject: str) -> dict:
   "correct_answer": "A或B或C或D"
 }}
 """
-    
-    try:
-        content = ""
-        
-        # 優先使用 Gemini（免費額度更高）
-        if LLM_PROVIDER == "gemini" and gemini_model:
-            # 設定較寬鬆的安全設定（避免內容被過濾）
-            safety_settings = {
-                genai.types.HarmCategory.HARM_CATEGORY_HATE_SPEECH: genai.types.HarmBlockThreshold.BLOCK_NONE,
-                genai.types.HarmCategory.HARM_CATEGORY_HARASSMENT: genai.types.HarmBlockThreshold.BLOCK_NONE,
-                genai.types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: genai.types.HarmBlockThreshold.BLOCK_NONE,
-                genai.types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: genai.types.HarmBlockThreshold.BLOCK_NONE,
-            }
-            
-            response = gemini_model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.8,
-                    # 不設置 max_output_tokens，避免 deprecated SDK 的 bug
-                ),
-                safety_settings=safety_settings
+
+
+def _build_batch_rewrite_prompt(qs: List[dict], subject: str) -> str:
+    """組出多題合併改寫的 prompt，要求回傳與原題順序相同的 JSON 陣列"""
+    subject_label = {"chinese": "國語", "english": "英語", "math": "數學"}[subject]
+    blocks = []
+    for i, q in enumerate(qs, 1):
+        opts = q.get("options", [])
+        blocks.append(
+            f"### 第 {i} 題\n{q.get('question', '')}\n\n"
+            + "\n".join(
+                f"({label}) {opts[j] if len(opts) > j else ''}"
+                for j, label in enumerate(["A", "B", "C", "D"])
             )
-            
-            # 檢查回應狀態
-            if response.prompt_feedback.block_reason:
-                print(f"[WARNING] Gemini 回應被阻擋: {response.prompt_feedback.block_reason}")
-                return _shuffle_options_fallback(q)
-            
-            content = response.text.strip()
+        )
+    originals = "\n\n".join(blocks)
+    
+    return f"""你是私立國中入學考題的出題專家。請將以下 {len(qs)} 題{subject_label}科題目逐題「改寫/變型」：
+
+{originals}
+
+**要求**（每一題都要做到）：
+1. 保持相同的**題型**與**難度**（小六升國一程度）
+2. 改變**題目文字、情境、數字**，使其成為全新但類似的題目
+3. 產生 4 個新選項（A/B/C/D），其中一個為正確答案
+4. 如果是數學題，數字要合理且答案可計算；如果是語文題，改寫措辭但考點不變
+
+**輸出格式（只輸出以下 JSON 陣列，共 {len(qs)} 個元素，順序與原題相同，不要其他說明）**：
+[
+  {{
+    "index": 1,
+    "question": "改寫後的題目文字",
+    "options": ["新選項A", "新選項B", "新選項C", "新選項D"],
+    "correct_answer": "A或B或C或D"
+  }}
+]
+"""
+
+
+def _llm_available() -> bool:
+    """目前設定的 LLM 提供商是否可用"""
+    if LLM_PROVIDER == "gemini":
+        return gemini_model is not None
+    if LLM_PROVIDER == "openai":
+        return openai_client is not None
+    return False
+
+
+def _batch_max_tokens(count: int) -> int:
+    """一次改寫 count 題時的輸出 token 上限（不低於單題呼叫）"""
+    return max(LLM_SINGLE_MAX_TOKENS, min(LLM_TOKENS_PER_QUESTION * count, LLM_MAX_TOKENS))
+
+
+def _batch_timeout(count: int) -> float:
+    """一次改寫 count 題時的逾時秒數：與輸出 token 上限等比例放大"""
+    return LLM_TIMEOUT * _batch_max_tokens(count) / LLM_SINGLE_MAX_TOKENS
+
+
+def _call_llm(
+    prompt: str,
+    max_tokens: int = LLM_SINGLE_MAX_TOKENS,
+    timeout: float = LLM_TIMEOUT,
+) -> Optional[str]:
+    """送出 prompt 並取回文字回應；無可用 API 或回應被阻擋時返回 None，網路錯誤直接拋出"""
+    # 優先使用 Gemini（免費額度更高）
+    if LLM_PROVIDER == "gemini" and gemini_model:
+        # 設定較寬鬆的安全設定（避免內容被過濾）
+        safety_settings = {
+            genai.types.HarmCategory.HARM_CATEGORY_HATE_SPEECH: genai.types.HarmBlockThreshold.BLOCK_NONE,
+            genai.types.HarmCategory.HARM_CATEGORY_HARASSMENT: genai.types.HarmBlockThreshold.BLOCK_NONE,
+            genai.types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: genai.types.HarmBlockThreshold.BLOCK_NONE,
+            genai.types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: genai.types.HarmBlockThreshold.BLOCK_NONE,
+        }
         
-        # 備用 OpenAI
-        elif LLM_PROVIDER == "openai" and openai_client:
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
+        response = gemini_model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
                 temperature=0.8,
-                max_tokens=1000,
-            )
-            content = response.choices[0].message.content.strip()
-        
-        # 無任何 API key
-        else:
-            print(f"無可用的 LLM API (provider={LLM_PROVIDER})，降級為選項打亂")
-            return _shuffle_options_fallback(q)
-        
-        # 去除可能的 markdown code block 標記
-        content = content.strip()
-        if content.startswith("```"):
-            # 移除開頭的 ```json 或 ```
-            content = re.sub(r'^```(?:json)?\s*\n', '', content)
-            # 移除結尾的 ```
-            content = re.sub(r'\n```\s*$', '', content)
-        content = content.strip()
-        
-        # Debug: 可選的調試輸出
-        # print(f"[DEBUG] 內容長度: {len(content)}")
-        
-        result = json.loads(content)
+                # 不設置 max_output_tokens，避免 deprecated SDK 的 bug
+            ),
+            safety_settings=safety_settings,
+            request_options={"timeout": timeout},
+        )
         
-        # 清理選項中可能的 (A)、(B) 等前綴
-        cleaned_options = []
-        for opt in result.get("options", opts):
-            # 移除開頭的 (A)、(B)、(C)、(D) 和空格
-            cleaned = re.sub(r'^\([A-D]\)\s*', '', str(opt)).strip()
-            cleaned_options.append(cleaned)
+        # 檢查回應狀態
+        if response.prompt_feedback.block_reason:
+            print(f"[WARNING] Gemini 回應被阻擋: {response.prompt_feedback.block_reason}")
+            return None
         
-        return {
-            "question": result.get("question", q_text),
-            "options": cleaned_options if cleaned_options else opts,
-            "correct_answer": result.get("correct_answer", "A"),
-        }
+        return response.text.strip()
     
+    # 備用 OpenAI
+    if LLM_PROVIDER == "openai" and openai_client:
+        response = openai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.8,
+            max_tokens=max_tokens,
+            timeout=timeout,
+        )
+        return response.choices[0].message.content.strip()
+    
+    # 無任何 API key
+    print(f"無可用的 LLM API (provider={LLM_PROVIDER})，降級為選項打亂")
+    return None
+
+
+def _parse_llm_json(content: str):
+    """去除可能的 markdown code block 標記後解析 JSON"""
+    content = content.strip()
+    if content.startswith("```"):
+        # 移除開頭的 ```json 或 ```
+        content = re.sub(r'^```(?:json)?\s*\n', '', content)
+        # 移除結尾的 ```
+        content = re.sub(r'\n```\s*$', '', content)
+    content = content.strip()
+    return json.loads(content)
+
+
+def _normalize_llm_question(result: dict, q: dict) -> dict:
+    """整理 LLM 回傳的單題 JSON，缺少的欄位沿用原題"""
+    opts = q.get("options", [])
+    # 清理選項中可能的 (A)、(B) 等前綴
+    cleaned_options = []
+    for opt in result.get("options", opts):
+        # 移除開頭的 (A)、(B)、(C)、(D) 和空格
+        cleaned = re.sub(r'^\([A-D]\)\s*', '', str(opt)).strip()
+        cleaned_options.append(cleaned)
+    
+    return {
+        "question": result.get("question", q.get("question", "")),
+        "options": cleaned_options if cleaned_options else opts,
+        "correct_answer": result.get("correct_answer", "A"),
+    }
+
+
+def _llm_rewrite_question(q: dict, subject: str) -> Optional[dict]:
+    """用 LLM 改寫單題；失敗或格式不合格時返回 None（不做降級）"""
+    try:
+        content = _call_llm(_build_rewrite_prompt(q, subject))
+        if content is None:
+            return None
+        rewritten = _normalize_llm_question(_parse_llm_json(content), q)
+    except Exception as e:
+        print(f"LLM 改寫失敗: {e}")
+        return None
+    if not is_valid_variant(rewritten):
+        print("LLM 改寫回傳格式不合格（選項數或答案錯誤），改用選項打亂")
+        return None
+    return rewritten
+
+
+def _llm_rewrite_questions_batch(qs: List[dict], subject: str) -> List[Optional[dict]]:
+    """
+    用一次 LLM 呼叫改寫多題；逐題驗證，格式不合格的題目該位置為 None
+    """
+    results: List[Optional[dict]] = [None] * len(qs)
+    try:
+        content = _call_llm(
+            _build_batch_rewrite_prompt(qs, subject),
+            max_tokens=_batch_max_tokens(len(qs)),
+            timeout=_batch_timeout(len(qs)),
+        )
+        if content is None:
+            return results
+        items = _parse_llm_json(content)
     except Exception as e:
-        print(f"LLM 改寫失敗: {e}，使用原題並打亂選項")
+        print(f"LLM 批次改寫失敗: {e}")
+        return results
+    if not isinstance(items, list):
+        print("LLM 批次改寫回傳格式錯誤（不是 JSON 陣列）")
+        return results
+    
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        # 優先依 index 對齊，沒有 index 時依順序
+        index = item.get("index", position + 1)
+        if not isinstance(index, int) or not 1 <= index <= len(qs) or results[index - 1] is not None:
+            continue
+        rewritten = _normalize_llm_question(item, qs[index - 1])
+        if is_valid_variant(rewritten):
+            results[index - 1] = rewritten
+    return results
+
+
+def _rewrite_questions_batch(qs: List[dict], subject: str) -> List[dict]:
+    """批次變型：合併成一次 LLM 呼叫，失敗的題目個別改用選項打亂（變型池由 variation_engine 先取用）"""
+    rewritten = _llm_rewrite_questions_batch(qs, subject)
+    return [r if r is not None else _shuffle_options_fallback(q) for q, r in zip(qs, rewritten)]
+
+
+def _rewrite_question_with_llm(q: dict, subject: str) -> dict:
+    """用 LLM 改寫題目：同概念、同難度，但新措辭、新數字、新情境。失敗時使用原題並打亂選項。"""
+    rewritten = _llm_rewrite_question(q, subject)
+    if rewritten is None:
         return _shuffle_options_fallback(q)
+    return rewritten
 
 
 def _shuffle_options_fallback(q: dict) -> dict:
@@ -327,17 +526,48 @@ def _shuffle_options_fallback(q: dict) -> dict:
     }
 
 
-def _apply_variation(q: dict, subject: str) -> dict:
-    """對單題做變型：優先用 LLM 改寫，無 API key 時改為選項打亂。"""
-    return _rewrite_question_with_llm(q, subject)
+def _take_pooled_variant(q: dict, subject: str) -> Optional[dict]:
+    return variant_pool.take(subject, q)
+
+
+# 題目變型引擎：優先從變型池取用，池空的題目平行用 LLM 改寫，逾時或失敗的題目改用選項打亂
+variation_engine = VariationEngine(
+    rewrite=_rewrite_question_with_llm,
+    fallback=_shuffle_options_fallback,
+    concurrency=LLM_CONCURRENCY,
+    timeout=LLM_TIMEOUT,
+    rewrite_batch=_rewrite_questions_batch,
+    batch_size=LLM_BATCH_SIZE,
+    batch_timeout=_batch_timeout,
+    take=_take_pooled_variant,
+)
+
+
+def _iter_all_bank_questions():
+    """依序列出所有科目題庫的 (科目, 題目)"""
+    for subject in ["chinese", "english", "math"]:
+        for q in bank_store.iter_questions(get_subject_bank_path(subject)):
+            yield subject, q
+
+
+# 背景補充器：讓每題在變型池中維持 VARIANT_POOL_TARGET 個變型
+variant_refiller = VariantRefiller(
+    variant_pool,
+    questions=_iter_all_bank_questions,
+    generate=_llm_rewrite_question,
+    target=VARIANT_POOL_TARGET,
+    delay=VARIANT_POOL_REFILL_DELAY,
+    lock_path=EXAMS_DIR / "variant_refiller.lock",
+)
 
 def _write_exam_file(
     filepath: pathlib.Path,
     title: str,
     subject_label: str,
     questions: List[dict],
+    update_catalog: bool = True,
 ) -> None:
-    """將考卷寫入 exams/generated/，題目來自題庫或佔位"""
+    """將考卷寫入 exams/generated/，題目來自題庫或佔位；update_catalog=False 時由呼叫端統一更新目錄"""
     GENERATED_DIR.mkdir(parents=True, exist_ok=True)
     subject_map = {"國語科": "一、國語科", "英語科": "二、英語科", "數學科": "三、數學科"}
     section = subject_map.get(subject_label, "題目區")
@@ -375,53 +605,25 @@ def _write_exam_file(
         ans = q.get("correct_answer", "A")
         lines.append(f"| {i} | ({ans}) | 2 | 題庫出題 |")
     content = "\n".join(lines)
-    filepath.write_text(content, encoding="utf-8")
-
-
-def generate_exam_with_ai(request: ExamRequest) -> str:
-    """從題庫抽題生成考卷，並寫入檔案"""
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    filename = f"exam-{request.subject}-{timestamp}.md"
-    filepath = GENERATED_DIR / filename
-    subject_label = {"chinese": "國語科", "english": "英語科", "math": "數學科"}[request.subject]
-    title = f"私立國中入學模擬考 - {subject_label}"
-    questions = _sample_from_bank(request.subject, request.num_questions)
-    if not questions:
-        # 題庫無題目時寫入佔位
-        questions = [
-            {"question": "（題目內容請由題庫或 AI 工作流程補充）", "options": ["選項 A", "選項 B", "選項 C", "選項 D"]}
-            for _ in range(min(request.num_questions, 50))
-        ]
-    _write_exam_file(filepath, title, subject_label, questions)
-    return filename
+    atomic_write_text(filepath, content)
+    write_exam_sidecar(
+        filepath, build_exam_record(title, subject_label, [(subject_label, questions)])
+    )
+    if update_catalog:
+        exam_catalog.upsert(filepath)
 
 
-def generate_mixed_exam_with_ai(request: MixedExamRequest) -> str:
-    """從題庫抽題生成綜合考卷（國語+英語+數學）"""
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    filename = f"mock-exam-{timestamp}-comprehensive.md"
-    filepath = GENERATED_DIR / filename
-    title = "私立國中入學模擬考 - 綜合版"
+def _write_mixed_exam_file(
+    filepath: pathlib.Path,
+    title: str,
+    chinese_q: List[dict],
+    english_q: List[dict],
+    math_q: List[dict],
+    update_catalog: bool = True,
+) -> None:
+    """將綜合考卷（國語+英語+數學）寫入 exams/generated/"""
     GENERATED_DIR.mkdir(parents=True, exist_ok=True)
-
-    chinese_q = _sample_from_bank("chinese", request.chinese_count)
-    english_q = _sample_from_bank("english", request.english_count)
-    math_q = _sample_from_bank("math", request.math_count)
-
-    def placeholder_list(n: int) -> List[dict]:
-        return [
-            {"question": "（題目待補充）", "options": ["選項 A", "選項 B", "選項 C", "選項 D"]}
-            for _ in range(n)
-        ]
-    if not chinese_q and request.chinese_count:
-        chinese_q = placeholder_list(request.chinese_count)
-    if not english_q and request.english_count:
-        english_q = placeholder_list(request.english_count)
-    if not math_q and request.math_count:
-        math_q = placeholder_list(request.math_count)
-
     n_ch, n_en, n_math = len(chinese_q), len(english_q), len(math_q)
-    total = n_ch + n_en + n_math
     lines = [
         f"# {title}",
         "",
@@ -479,11 +681,276 @@ def generate_mixed_exam_with_ai(request: MixedExamRequest) -> str:
     for i, q in enumerate(math_q, start_math):
         ans = q.get("correct_answer", "A")
         lines.append(f"| {i} | ({ans}) | 2 | 題庫出題 |")
-    filepath.write_text("\n".join(lines), encoding="utf-8")
+    atomic_write_text(filepath, "\n".join(lines))
+    write_exam_sidecar(filepath, build_exam_record(title, "綜合科", [
+        ("國語科", chinese_q),
+        ("英語科", english_q),
+        ("數學科", math_q),
+    ]))
+    if update_catalog:
+        exam_catalog.upsert(filepath)
+
+
+SUBJECT_LABELS = {"chinese": "國語科", "english": "英語科", "math": "數學科"}
+
+
+def _new_exam_filename(subject: str) -> str:
+    """
+    產生新考卷檔名；subject 為 "mixed" 時為綜合卷
+
+    以 ULID 編號（依產生時間排序、程序內單調遞增），多個 worker 或執行緒同時出題也不會撞名，
+    不需要預留檔案或加鎖。
+    """
+    ulid = new_ulid()
+    if subject == "mixed":
+        return f"mock-exam-{ulid}-comprehensive.md"
+    return f"exam-{subject}-{ulid}.md"
+
+
+def _placeholder_questions(n: int, text: str = "（題目待補充）") -> List[dict]:
+    """題庫無題目時的佔位題"""
+    return [
+        {"question": text, "options": ["選項 A", "選項 B", "選項 C", "選項 D"]}
+        for _ in range(n)
+    ]
+
+
+def _pick_exam_jobs(request: ExamRequest) -> List[tuple]:
+    """單科卷抽題，返回變型引擎用的 (題目, 科目) 列表"""
+    chosen = _pick_from_bank(
+        request.subject,
+        request.num_questions,
+        rng=make_rng(request.seed),
+        student_id=request.student_id,
+        stratify_by=request.stratify_by,
+    )
+    return [(q, request.subject) for q in chosen]
+
+
+def _pick_mixed_jobs(request: MixedExamRequest) -> List[tuple]:
+    """綜合卷依國語、英語、數學順序抽題（指定 stratify_by 時各科分別分層），返回變型引擎用的 (題目, 科目) 列表"""
+    rng = make_rng(request.seed)
+    jobs = []
+    for subject, count in (
+        ("chinese", request.chinese_count),
+        ("english", request.english_count),
+        ("math", request.math_count),
+    ):
+        chosen = _pick_from_bank(
+            subject, count, rng=rng, student_id=request.student_id, stratify_by=request.stratify_by
+        )
+        jobs.extend((q, subject) for q in chosen)
+    return jobs
+
+
+def _save_single_exam(
+    filename: str,
+    request: ExamRequest,
+    questions: List[dict],
+    update_catalog: bool = True,
+) -> None:
+    """寫入單科考卷（題庫無題目時寫入佔位）"""
+    subject_label = SUBJECT_LABELS[request.subject]
+    title = f"私立國中入學模擬考 - {subject_label}"
+    if not questions:
+        # 題庫無題目時寫入佔位
+        questions = _placeholder_questions(
+            min(request.num_questions, 50), "（題目內容請由題庫或 AI 工作流程補充）"
+        )
+    _write_exam_file(GENERATED_DIR / filename, title, subject_label, questions, update_catalog)
+
+
+def _save_mixed_exam(
+    filename: str,
+    request: MixedExamRequest,
+    jobs: List[tuple],
+    varied: List[dict],
+    update_catalog: bool = True,
+) -> None:
+    """依科目拆開變型後的題目並寫入綜合考卷"""
+    by_subject = {"chinese": [], "english": [], "math": []}
+    for (_, subject), q in zip(jobs, varied):
+        by_subject[subject].append(q)
+    chinese_q, english_q, math_q = by_subject["chinese"], by_subject["english"], by_subject["math"]
+    if not chinese_q and request.chinese_count:
+        chinese_q = _placeholder_questions(request.chinese_count)
+    if not english_q and request.english_count:
+        english_q = _placeholder_questions(request.english_count)
+    if not math_q and request.math_count:
+        math_q = _placeholder_questions(request.math_count)
+    _write_mixed_exam_file(
+        GENERATED_DIR / filename, "私立國中入學模擬考 - 綜合版", chinese_q, english_q, math_q,
+        update_catalog,
+    )
+
+
+def _mixed_question_ids(request: MixedExamRequest, jobs: List[tuple]) -> List[int]:
+    """綜合卷中每個 job 最終的題號（與 _save_mixed_exam 寫出的題號一致，含佔位題造成的位移）"""
+    per_subject = {"chinese": 0, "english": 0, "math": 0}
+    for _, subject in jobs:
+        per_subject[subject] += 1
+    offsets, start = {}, 1
+    for subject, count in (
+        ("chinese", request.chinese_count),
+        ("english", request.english_count),
+        ("math", request.math_count),
+    ):
+        offsets[subject] = start
+        start += per_subject[subject] or count
+    ids = []
+    for _, subject in jobs:
+        ids.append(offsets[subject])
+        offsets[subject] += 1
+    return ids
+
+
+def generate_exam_with_ai(
+    request: ExamRequest,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """從題庫抽題生成考卷，並寫入檔案；on_progress(已完成題數, 總題數) 回報變型進度"""
+    filename = _new_exam_filename(request.subject)
+    jobs = _pick_exam_jobs(request)
+    questions = variation_engine.vary_sync(jobs, on_progress)
+    _save_single_exam(filename, request, questions)
+    _record_student_history(request.student_id, filename, jobs)
     return filename
 
+
+def generate_mixed_exam_with_ai(
+    request: MixedExamRequest,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """從題庫抽題生成綜合考卷（國語+英語+數學）；on_progress(已完成題數, 總題數) 回報變型進度"""
+    filename = _new_exam_filename("mixed")
+    # 三科一起送進變型引擎，讓所有題目同時平行改寫
+    jobs = _pick_mixed_jobs(request)
+    varied = variation_engine.vary_sync(jobs, on_progress)
+    _save_mixed_exam(filename, request, jobs, varied)
+    _record_student_history(request.student_id, filename, jobs)
+    return filename
+
+
+BULK_MAX_EXAMS = 500
+BATCHES_DIR = GENERATED_DIR / "batches"
+
+
+def _bulk_exam_requests(request: BulkExamRequest) -> List[tuple]:
+    """展開整班出題請求，返回 [(學生 ID, 單份請求), ...]；各份的 seed 由整批 seed 推導"""
+    student_ids = request.student_ids or [None] * request.count
+    seeds = make_rng(request.seed) if request.seed is not None else None
+    per_exam = []
+    for student_id in student_ids:
+        seed = seeds.getrandbits(63) if seeds else None
+        if request.subject == "mixed":
+            exam_request = MixedExamRequest(
+                chinese_count=request.chinese_count,
+                english_count=request.english_count,
+                math_count=request.math_count,
+                student_id=student_id,
+                seed=seed,
+                stratify_by=request.stratify_by,
+            )
+        else:
+            exam_request = ExamRequest(
+                subject=request.subject,
+                num_questions=request.num_questions,
+                student_id=student_id,
+                seed=seed,
+                stratify_by=request.stratify_by,
+            )
+        per_exam.append((student_id, exam_request))
+    return per_exam
+
+
+def generate_bulk_exams(
+    request: BulkExamRequest,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    一次產生多份考卷
+
+    所有考卷共用已快取的題庫與變型池，全部題目一起送進變型引擎平行改寫，
+    寫檔後一次更新考卷目錄，並在 exams/generated/batches/ 寫入清單（manifest）。
+    """
+    batch_id = f"batch-{new_ulid()}"
+    per_exam = _bulk_exam_requests(request)
+
+    # 1. 抽題（各份獨立，指定學生時避開各自的近期題目）；ULID 檔名依序遞增，與清單順序一致
+    picked = []
+    for student_id, exam_request in per_exam:
+        if request.subject == "mixed":
+            jobs = _pick_mixed_jobs(exam_request)
+        else:
+            jobs = _pick_exam_jobs(exam_request)
+        picked.append((_new_exam_filename(request.subject), exam_request, jobs))
+
+    # 2. 所有考卷的題目一起平行變型
+    all_jobs = [job for _, _, jobs in picked for job in jobs]
+    varied = variation_engine.vary_sync(all_jobs, on_progress)
+
+    # 3. 寫檔，最後一次更新目錄
+    exams, offset = [], 0
+    for filename, exam_request, jobs in picked:
+        exam_varied = varied[offset:offset + len(jobs)]
+        offset += len(jobs)
+        if request.subject == "mixed":
+            _save_mixed_exam(filename, exam_request, jobs, exam_varied, update_catalog=False)
+            total_questions = (
+                exam_request.chinese_count + exam_request.english_count + exam_request.math_count
+            )
+        else:
+            _save_single_exam(filename, exam_request, exam_varied, update_catalog=False)
+            total_questions = exam_request.num_questions
+        _record_student_history(exam_request.student_id, filename, jobs)
+        exam_id = pathlib.Path(filename).stem
+        exams.append({
+            "exam_id": exam_id,
+            "filename": filename,
+            "student_id": exam_request.student_id,
+            "seed": exam_request.seed,
+            "total_questions": total_questions,
+            "download_url": f"/api/exams/{exam_id}/download",
+        })
+    exam_catalog.upsert_many([GENERATED_DIR / e["filename"] for e in exams])
+
+    manifest = {
+        "batch_id": batch_id,
+        "subject": request.subject,
+        "seed": request.seed,
+        "created_at": datetime.now().isoformat(),
+        "total_exams": len(exams),
+        "exams": exams,
+    }
+    BATCHES_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(BATCHES_DIR / f"{batch_id}.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
 # ==================== API 端點 ====================
 
+@app.on_event("startup")
+async def start_background_workers():
+    """啟動背景工作（變型池補充）"""
+    # 登記本程序的背景工作 instance，上次執行（或已結束的 worker）留下的未完成工作標為失敗
+    orphaned = await run_in_threadpool(job_manager.start)
+    if orphaned:
+        print(f"已將 {orphaned} 個中斷的背景工作標為失敗")
+    # 與磁碟同步考卷目錄（補上手動放入或在 API 之外產生的檔案）
+    count = await run_in_threadpool(exam_catalog.rebuild, GENERATED_DIR)
+    print(f"考卷目錄已同步：{count} 份")
+    if VARIANT_POOL_TARGET > 0 and _llm_available():
+        variant_refiller.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """停止背景工作"""
+    variant_refiller.stop()
+    job_manager.shutdown()
+    variation_engine.shutdown()
+    exam_cache.shutdown()
+    await pdf_service.stop()
+
 @app.get("/")
 async def root():
     """健康檢查"""
@@ -493,9 +960,10 @@ async def root():
         "version": "1.0.0"
     }
 
-@app.get("/api/subjects")
-async def get_subjects():
-    """取得所有科目資訊"""
+# 以下端點的檔案、SQLite 存取都透過 run_in_threadpool 在執行緒中進行，
+# 不在 event loop 上做阻塞 I/O（一個慢的磁碟操作不會拖慢其他請求）
+
+def _subjects_info() -> List[dict]:
     subjects = []
     
     for subject in ["chinese", "english", "math"]:
@@ -508,36 +976,56 @@ async def get_subjects():
             "question_count": question_count,
             "available": bank_path.exists()
         })
-    
+    return subjects
+
+@app.get("/api/subjects")
+async def get_subjects():
+    """取得所有科目資訊"""
+    subjects = await run_in_threadpool(_subjects_info)
     return {"subjects": subjects}
 
+def _check_date_param(name: str, value: Optional[str]) -> None:
+    """日期參數必須是 YYYY-MM-DD；格式錯誤時 SQLite 的 date() 會得到 NULL，查詢靜默返回空結果"""
+    if value is None:
+        return
+    try:
+        if len(value) != 10:
+            raise ValueError
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"{name} 格式錯誤，應為 YYYY-MM-DD")
+
 @app.get("/api/exams")
-async def list_exams():
-    """列出所有已生成的考卷"""
-    if not GENERATED_DIR.exists():
-        return {"exams": []}
-    
-    exams = []
-    for md_file in GENERATED_DIR.glob("*.md"):
-        pdf_file = md_file.with_suffix('.pdf')
-        stat = md_file.stat()
-        
-        exams.append(ExamListItem(
-            exam_id=md_file.stem,
-            filename=md_file.name,
-            created_at=datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            file_size=stat.st_size,
-            has_pdf=pdf_file.exists()
-        ))
+async def list_exams(
+    subject: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """
+    列出已生成的考卷（最新的在前）
     
-    # 按時間排序（最新的在前）
-    exams.sort(key=lambda x: x.created_at, reverse=True)
-    
-    return {"exams": exams}
+    - subject：chinese / english / math / mixed
+    - date_from、date_to：YYYY-MM-DD（含當日）
+    - limit、offset：分頁，未指定 limit 時返回全部
+    """
+    _check_date_param("date_from", date_from)
+    _check_date_param("date_to", date_to)
+    await run_in_threadpool(exam_catalog.refresh_pdfs, GENERATED_DIR)
+    items, total = await run_in_threadpool(
+        exam_catalog.query,
+        subject=subject, date_from=date_from, date_to=date_to, limit=limit, offset=offset,
+    )
+    return {"exams": [ExamListItem(**item) for item in items], "total": total}
 
-@app.get("/api/exams/{exam_id}")
-async def get_exam(exam_id: str):
-    """取得特定考卷的內容"""
+@app.post("/api/exams/reindex")
+async def reindex_exams():
+    """依磁碟上的檔案重建考卷目錄"""
+    count = await run_in_threadpool(exam_catalog.rebuild, GENERATED_DIR)
+    return {"success": True, "total_exams": count}
+
+def _read_exam(exam_id: str) -> dict:
     md_file = GENERATED_DIR / f"{exam_id}.md"
     
     if not md_file.exists():
@@ -555,9 +1043,13 @@ async def get_exam(exam_id: str):
         "created_at": datetime.fromtimestamp(md_file.stat().st_mtime).isoformat()
     }
 
-@app.post("/api/exams/generate", response_model=ExamResponse)
-async def generate_exam(request: ExamRequest):
-    """生成單科考卷"""
+@app.get("/api/exams/{exam_id}")
+async def get_exam(exam_id: str):
+    """取得特定考卷的內容"""
+    return await run_in_threadpool(_read_exam, exam_id)
+
+def _validate_exam_request(request: ExamRequest) -> None:
+    """檢查單科出題請求（科目與題庫）"""
     # 驗證科目
     if request.subject not in ["chinese", "english", "math"]:
         raise HTTPException(status_code=400, detail="不支援的科目")
@@ -566,9 +1058,54 @@ async def generate_exam(request: ExamRequest):
     bank_path = get_subject_bank_path(request.subject)
     if not bank_path.exists():
         raise HTTPException(status_code=404, detail=f"{request.subject} 題庫不存在")
+
+def _validate_mixed_exam_request(request: MixedExamRequest) -> int:
+    """檢查綜合出題請求，返回總題數"""
+    total = request.chinese_count + request.english_count + request.math_count
+    
+    if total == 0:
+        raise HTTPException(status_code=400, detail="至少要有一科的題目")
+    return total
+
+def _validate_bulk_exam_request(request: BulkExamRequest) -> int:
+    """檢查整班出題請求，返回份數"""
+    if request.subject == "mixed":
+        _validate_mixed_exam_request(MixedExamRequest(
+            chinese_count=request.chinese_count,
+            english_count=request.english_count,
+            math_count=request.math_count,
+        ))
+    else:
+        _validate_exam_request(ExamRequest(subject=request.subject, num_questions=request.num_questions))
+    
+    count = len(request.student_ids) if request.student_ids else request.count
+    if count <= 0:
+        raise HTTPException(status_code=400, detail="請提供 count 或 student_ids")
+    if count > BULK_MAX_EXAMS:
+        raise HTTPException(status_code=400, detail=f"一次最多產生 {BULK_MAX_EXAMS} 份考卷")
+    if request.student_ids and len(set(request.student_ids)) != len(request.student_ids):
+        raise HTTPException(status_code=400, detail="student_ids 不可重複")
+    return count
+
+def _exam_job_result(filename: str, total_questions: int) -> dict:
+    """背景工作完成後的結果（與 ExamResponse 欄位相同）"""
+    exam_id = pathlib.Path(filename).stem
+    return ExamResponse(
+        exam_id=exam_id,
+        filename=filename,
+        total_questions=total_questions,
+        created_at=datetime.now().isoformat(),
+        download_url=f"/api/exams/{exam_id}/download"
+    ).model_dump()
+
+@app.post("/api/exams/generate", response_model=ExamResponse)
+async def generate_exam(request: ExamRequest):
+    """生成單科考卷"""
+    await run_in_threadpool(_validate_exam_request, request)
     
     # 生成考卷檔名
-    filename = generate_exam_with_ai(request)
+    # 出題包含 LLM 網路呼叫與檔案寫入，移到執行緒池中執行以免阻塞其他請求
+    filename = await run_in_threadpool(generate_exam_with_ai, request)
     exam_id = pathlib.Path(filename).stem
     
     # 這裡可以呼叫實際的 AI 生成邏輯
@@ -585,13 +1122,10 @@ async def generate_exam(request: ExamRequest):
 @app.post("/api/exams/generate-mixed", response_model=ExamResponse)
 async def generate_mixed_exam(request: MixedExamRequest):
     """生成綜合考卷（國語 + 英語 + 數學）"""
-    total = request.chinese_count + request.english_count + request.math_count
-    
-    if total == 0:
-        raise HTTPException(status_code=400, detail="至少要有一科的題目")
+    total = _validate_mixed_exam_request(request)
     
     # 生成檔名
-    filename = generate_mixed_exam_with_ai(request)
+    filename = await run_in_threadpool(generate_mixed_exam_with_ai, request)
     exam_id = pathlib.Path(filename).stem
     
     # TODO: 整合實際的 AI 生成邏輯
@@ -605,11 +1139,141 @@ async def generate_mixed_exam(request: MixedExamRequest):
         download_url=f"/api/exams/{exam_id}/download"
     )
 
-@app.get("/api/exams/{exam_id}/download")
-async def download_exam(exam_id: str):
-    """下載考卷（Markdown 或 PDF）"""
-    from fastapi.responses import FileResponse
+@app.post("/api/jobs/generate", response_model=JobStatus)
+async def submit_generate_job(request: ExamRequest):
+    """送出單科出題背景工作，立即返回 job_id"""
+    await run_in_threadpool(_validate_exam_request, request)
     
+    def run(req: ExamRequest, on_progress) -> dict:
+        filename = generate_exam_with_ai(req, on_progress=on_progress)
+        return _exam_job_result(filename, req.num_questions)
+    
+    job_id = await run_in_threadpool(job_manager.submit, "generate", run, request)
+    return await run_in_threadpool(job_manager.get, job_id)
+
+@app.post("/api/jobs/generate-mixed", response_model=JobStatus)
+async def submit_generate_mixed_job(request: MixedExamRequest):
+    """送出綜合出題背景工作，立即返回 job_id"""
+    total = _validate_mixed_exam_request(request)
+    
+    def run(req: MixedExamRequest, on_progress) -> dict:
+        filename = generate_mixed_exam_with_ai(req, on_progress=on_progress)
+        return _exam_job_result(filename, total)
+    
+    job_id = await run_in_threadpool(job_manager.submit, "generate-mixed", run, request)
+    return await run_in_threadpool(job_manager.get, job_id)
+
+@app.post("/api/jobs/generate-bulk", response_model=JobStatus)
+async def submit_generate_bulk_job(request: BulkExamRequest):
+    """送出整班出題背景工作（每位學生一份不同的考卷），完成後 result 為整批清單"""
+    await run_in_threadpool(_validate_bulk_exam_request, request)
+    
+    job_id = await run_in_threadpool(job_manager.submit, "generate-bulk", generate_bulk_exams, request)
+    return await run_in_threadpool(job_manager.get, job_id)
+
+def _read_batch_manifest(batch_id: str) -> dict:
+    manifest_file = BATCHES_DIR / f"{batch_id}.json"
+    if not re.fullmatch(r"batch-[\w-]+", batch_id) or not manifest_file.exists():
+        raise HTTPException(status_code=404, detail="清單不存在")
+    return json.loads(manifest_file.read_text(encoding="utf-8"))
+
+@app.get("/api/batches/{batch_id}")
+async def get_batch_manifest(batch_id: str):
+    """取得整班出題的清單"""
+    return await run_in_threadpool(_read_batch_manifest, batch_id)
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """查詢背景工作進度；完成後 result 內含考卷資訊"""
+    job = await run_in_threadpool(job_manager.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="工作不存在")
+    return job
+
+def _sse(event: str, data: dict) -> str:
+    """組出一則 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_exam_events(
+    filename: str,
+    jobs: List[tuple],
+    question_ids: List[int],
+    save: Callable[[List[dict]], None],
+):
+    """
+    逐題產出變型完成的題目（不含答案），全部完成後寫入考卷
+
+    事件：start（考卷資訊）→ question（每題一則，依完成先後）→ done（已寫入檔案）
+    """
+    exam_id = pathlib.Path(filename).stem
+    yield _sse("start", {"exam_id": exam_id, "total_questions": len(jobs)})
+    varied: List[Optional[dict]] = [None] * len(jobs)
+    async for index, q in variation_engine.stream(jobs):
+        varied[index] = q
+        yield _sse("question", {
+            "id": question_ids[index],
+            "subject": SUBJECT_LABELS[jobs[index][1]],
+            "question": q.get("question", ""),
+            "options": [
+                {"label": label, "text": text}
+                for label, text in zip(["A", "B", "C", "D"], q.get("options", []))
+            ],
+        })
+    await run_in_threadpool(save, varied)
+    yield _sse("done", {
+        "exam_id": exam_id,
+        "filename": filename,
+        "download_url": f"/api/exams/{exam_id}/download",
+    })
+
+@app.post("/api/exams/generate/stream")
+async def generate_exam_stream(request: ExamRequest):
+    """生成單科考卷，以 SSE 逐題回傳變型完成的題目"""
+    await run_in_threadpool(_validate_exam_request, request)
+    
+    filename = _new_exam_filename(request.subject)
+    jobs = await run_in_threadpool(_pick_exam_jobs, request)
+    
+    def save(varied: List[dict]) -> None:
+        _save_single_exam(filename, request, varied)
+        _record_student_history(request.student_id, filename, jobs)
+    
+    events = _stream_exam_events(filename, jobs, list(range(1, len(jobs) + 1)), save)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+@app.post("/api/exams/generate-mixed/stream")
+async def generate_mixed_exam_stream(request: MixedExamRequest):
+    """生成綜合考卷，以 SSE 逐題回傳變型完成的題目"""
+    _validate_mixed_exam_request(request)
+    
+    filename = _new_exam_filename("mixed")
+    jobs = await run_in_threadpool(_pick_mixed_jobs, request)
+    
+    def save(varied: List[dict]) -> None:
+        _save_mixed_exam(filename, request, jobs, varied)
+        _record_student_history(request.student_id, filename, jobs)
+    
+    events = _stream_exam_events(filename, jobs, _mixed_question_ids(request, jobs), save)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+def _delete_exam_files(exam_id: str) -> None:
+    md_file = GENERATED_DIR / f"{exam_id}.md"
+    
+    if not md_file.exists():
+        raise HTTPException(status_code=404, detail="考卷不存在")
+    
+    for path in (md_file, md_file.with_suffix('.pdf'), sidecar_path(md_file)):
+        path.unlink(missing_ok=True)
+    exam_catalog.remove(exam_id)
+    exam_cache.invalidate(exam_id)
+
+@app.delete("/api/exams/{exam_id}")
+async def delete_exam(exam_id: str):
+    """刪除考卷（Markdown、PDF 與 JSON）"""
+    await run_in_threadpool(_delete_exam_files, exam_id)
+    return {"success": True, "exam_id": exam_id}
+
+def _find_download(exam_id: str) -> FileResponse:
     md_file = GENERATED_DIR / f"{exam_id}.md"
     pdf_file = GENERATED_DIR / f"{exam_id}.pdf"
     
@@ -629,68 +1293,106 @@ async def download_exam(exam_id: str):
     else:
         raise HTTPException(status_code=404, detail="考卷不存在")
 
+@app.get("/api/exams/{exam_id}/download")
+async def download_exam(exam_id: str):
+    """下載考卷（Markdown 或 PDF）；檔案內容由 FileResponse 非同步串流"""
+    return await run_in_threadpool(_find_download, exam_id)
+
 @app.post("/api/exams/{exam_id}/generate-pdf")
 async def generate_pdf(exam_id: str):
     """為考卷生成 PDF"""
     md_file = GENERATED_DIR / f"{exam_id}.md"
     
-    if not md_file.exists():
+    if not await run_in_threadpool(md_file.exists):
         raise HTTPException(status_code=404, detail="考卷不存在")
     
-    # 執行 PDF 轉換腳本
-    script_path = BASE_DIR / "scripts" / "convert-to-pdf.js"
-    
+    # 交給常駐的 PDF 服務轉換（非同步等待，不佔用 event loop）
     try:
-        result = subprocess.run(
-            ["node", str(script_path), str(md_file)],
-            capture_output=True,
-            text=True,
-            check=True
+        pdf_file = await pdf_service.render(md_file)
+    except PdfServiceBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"PDF 服務忙碌，請稍後再試: {e}",
+            headers={"Retry-After": str(e.retry_after)},
         )
-        
-        pdf_file = md_file.with_suffix('.pdf')
-        
-        return {
-            "success": True,
-            "exam_id": exam_id,
-            "pdf_path": str(pdf_file),
-            "message": "PDF 生成成功"
-        }
-    except subprocess.CalledProcessError as e:
+    except PdfRenderError as e:
         raise HTTPException(
             status_code=500,
-            detail=f"PDF 生成失敗: {e.stderr}"
+            detail=f"PDF 生成失敗: {e}"
         )
+    
+    await run_in_threadpool(lambda: exam_catalog.set_has_pdf(exam_id, pdf_file.exists()))
+    
+    return {
+        "success": True,
+        "exam_id": exam_id,
+        "pdf_path": str(pdf_file),
+        "message": "PDF 生成成功"
+    }
 
-@app.get("/api/stats")
-async def get_stats():
-    """取得統計資訊"""
+def _collect_stats() -> dict:
+    exam_catalog.refresh_pdfs(GENERATED_DIR)
+    counts = exam_catalog.counts()
     stats = {
-        "total_exams": len(list(GENERATED_DIR.glob("*.md"))) if GENERATED_DIR.exists() else 0,
-        "total_pdfs": len(list(GENERATED_DIR.glob("*.pdf"))) if GENERATED_DIR.exists() else 0,
+        "total_exams": counts["total_exams"],
+        "total_pdfs": counts["total_pdfs"],
         "subjects": {}
     }
     
+    pool_counts = variant_pool.counts_by_subject()
     for subject in ["chinese", "english", "math"]:
         stats["subjects"][subject] = {
             "name": {"chinese": "國語", "english": "英語", "math": "數學"}[subject],
-            "question_count": count_questions_in_bank(subject)
+            "question_count": count_questions_in_bank(subject),
+            "pooled_variants": pool_counts.get(subject, 0),
         }
     
     return stats
 
-@app.get("/api/quiz/{exam_id}", response_model=ExamForQuiz)
-async def get_exam_for_quiz(exam_id: str):
-    """取得考卷資料供答題使用（不包含答案）"""
+@app.get("/api/stats")
+async def get_stats():
+    """取得統計資訊"""
+    return await run_in_threadpool(_collect_stats)
+
+async def _get_parsed_exam(exam_id: str):
+    """
+    經由快取取得已解析的考卷（含答案）；不存在時 404，解析失敗時 500
+    剛確認過的考卷直接從記憶體取得，否則由快取的載入執行緒檢查檔案並載入
+    """
     md_file = GENERATED_DIR / f"{exam_id}.md"
-    
-    if not md_file.exists():
-        raise HTTPException(status_code=404, detail="考卷不存在")
-    
-    # 解析考卷
-    exam_data = parse_exam_file(md_file)
-    if not exam_data:
+    parsed = await exam_cache.load(exam_id, md_file)
+    if parsed is None:
+        if not await run_in_threadpool(md_file.exists):
+            raise HTTPException(status_code=404, detail="考卷不存在")
         raise HTTPException(status_code=500, detail="考卷解析失敗")
+    return parsed
+
+SESSION_ERRORS = {
+    "not_found": (404, "作答階段不存在或已過期，請重新開卷"),
+    "expired": (410, "作答時間已過，請重新開卷"),
+    "exam_mismatch": (400, "作答階段與考卷不符"),
+    "submitted": (409, "此次作答已交卷"),
+}
+
+def _session_http_error(error: SessionError) -> HTTPException:
+    status, detail = SESSION_ERRORS[error.reason]
+    return HTTPException(status_code=status, detail=detail)
+
+@app.get("/api/quiz/sessions/{session_id}")
+async def get_quiz_session(session_id: str):
+    """查詢作答階段（交卷後含成績）"""
+    session = await run_in_threadpool(quiz_sessions.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="作答階段不存在或已過期")
+    return session
+
+@app.get("/api/quiz/{exam_id}", response_model=ExamForQuiz)
+async def get_exam_for_quiz(exam_id: str, student_id: Optional[str] = None):
+    """取得考卷資料供答題使用（不包含答案），並開啟一個作答階段"""
+    # 解析考卷（經由快取）
+    parsed = await _get_parsed_exam(exam_id)
+    exam_data = parsed.data
+    session = await run_in_threadpool(quiz_sessions.open, exam_id, parsed.signature, student_id)
     
     # 移除答案（不要傳給前端）
     questions = []
@@ -711,7 +1413,9 @@ async def get_exam_for_quiz(exam_id: str):
         title=exam_data['title'],
         subject=exam_data['subject'],
         total_questions=exam_data['total_questions'],
-        questions=questions
+        questions=questions,
+        session_id=session["session_id"],
+        expires_at=session["expires_at"],
     )
 
 @app.get("/api/images/{filename}")
@@ -719,23 +1423,28 @@ async def get_image(filename: str):
     """取得考卷圖片"""
     image_path = IMAGES_DIR / filename
     
-    if not image_path.exists():
+    if not await run_in_threadpool(image_path.is_file):
         raise HTTPException(status_code=404, detail="圖片不存在")
     
     return FileResponse(image_path)
 
 @app.post("/api/quiz/submit", response_model=QuizResult)
 async def submit_quiz(request: SubmitQuizRequest):
-    """提交答案並評分"""
-    md_file = GENERATED_DIR / f"{request.exam_id}.md"
+    """提交答案並評分（需帶開卷時取得的 session_id）"""
+    if not request.session_id:
+        raise HTTPException(status_code=400, detail="缺少 session_id，請先開卷")
     
-    if not md_file.exists():
-        raise HTTPException(status_code=404, detail="考卷不存在")
+    # 解析考卷（含答案，經由快取）
+    parsed = await _get_parsed_exam(request.exam_id)
+    exam_data = parsed.data
     
-    # 解析考卷（含答案）
-    exam_data = parse_exam_file(md_file)
-    if not exam_data:
-        raise HTTPException(status_code=500, detail="考卷解析失敗")
+    # 確認作答階段未過期、未交卷，且考卷在作答期間沒有被改寫
+    try:
+        signature = await run_in_threadpool(quiz_sessions.check, request.session_id, request.exam_id)
+    except SessionError as e:
+        raise _session_http_error(e)
+    if signature != format_signature(parsed.signature):
+        raise HTTPException(status_code=409, detail="考卷在作答期間已更新，請重新開卷")
     
     # 建立答案對照表
     user_answers_dict = {ans.question_id: ans.user_answer for ans in request.answers}
@@ -746,7 +1455,7 @@ async def submit_quiz(request: SubmitQuizRequest):
     
     for q in exam_data['questions']:
         q_id = q['id']
-        correct_ans = q.get('correct_answer', '')
+        correct_ans = parsed.correct_answer(q_id)
         user_ans = user_answers_dict.get(q_id, '')
         is_correct = user_ans == correct_ans
         
@@ -764,13 +1473,19 @@ async def submit_quiz(request: SubmitQuizRequest):
     total = exam_data['total_questions']
     score = int((correct_count / total) * 100) if total > 0 else 0
     
+    try:
+        await run_in_threadpool(quiz_sessions.submit, request.session_id, correct_count, score)
+    except SessionError as e:
+        raise _session_http_error(e)
+    
     return QuizResult(
         exam_id=request.exam_id,
         subject=exam_data['subject'],
         total_questions=total,
         correct_count=correct_count,
         score=score,
-        answers=answer_details
+        answers=answer_details,
+        session_id=request.session_id,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+"""
+PDF 轉換服務客戶端
+透過本機 HTTP 呼叫常駐的 scripts/pdf-server.js（瀏覽器與 MathJax 只啟動一次）；
+服務未啟動時可自動帶起，連不上時改為非同步執行一次性的 convert-to-pdf.js；
+服務忙碌（佇列已滿）時不改用一次性轉換，而是回報忙碌讓呼叫端稍後重試
+"""
+
+import os
+import asyncio
+import pathlib
+from typing import Optional
+
+import httpx
+
+
+# 服務忙碌但沒有提供 Retry-After 時，建議的重試秒數
+DEFAULT_RETRY_AFTER = 5
+
+class PdfRenderError(Exception):
+    """PDF 轉換失敗"""
+
+
+class PdfServiceBusy(PdfRenderError):
+    """常駐服務佇列已滿；retry_after 為建議的重試秒數"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PdfService:
+    """
+    非同步 PDF 轉換
+
+    - 優先送到常駐服務（併發與排隊由服務控制）
+    - autostart：服務沒有回應時由後端啟動 pdf-server.js，關閉時一併結束
+    - 常駐服務連不上時，改用一次性的 node 程序，同時最多 fallback_concurrency 個
+    - 常駐服務回應 503（佇列已滿）時拋出 PdfServiceBusy；此時再各自啟動瀏覽器只會加重負載，
+      也會繞過服務的 PDF_CONCURRENCY 與 PDF_QUEUE_LIMIT
+    """
+
+    def __init__(
+        self,
+        scripts_dir: pathlib.Path,
+        host: str = "127.0.0.1",
+        port: int = 3100,
+        autostart: bool = True,
+        timeout: float = 120.0,
+        startup_timeout: float = 30.0,
+        fallback_concurrency: int = 2,
+    ):
+        self.server_script = scripts_dir / "pdf-server.js"
+        self.cli_script = scripts_dir / "convert-to-pdf.js"
+        self.base_url = f"http://{host}:{port}"
+        self.port = port
+        self.autostart = autostart
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self._fallback_concurrency = max(1, fallback_concurrency)
+        self._fallback_semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    async def _healthy(self) -> bool:
+        try:
+            resp = await self._http().get("/health", timeout=2.0)
+            return resp.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def start(self) -> bool:
+        """確認常駐服務可用（需要時自動啟動），返回是否可用"""
+        if await self._healthy():
+            return True
+        if not self.autostart:
+            return False
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if await self._healthy():
+                return True
+            if self._process is None or self._process.returncode is not None:
+                try:
+                    self._process = await asyncio.create_subprocess_exec(
+                        "node", str(self.server_script),
+                        env={**os.environ, "PDF_SERVICE_PORT": str(self.port)},
+                    )
+                except OSError as e:
+                    print(f"PDF 服務啟動失敗: {e}")
+                    return False
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.startup_timeout
+            while loop.time() < deadline:
+                if await self._healthy():
+                    return True
+                if self._process.returncode is not None:
+                    # 程序已結束（例如埠號被另一個 worker 啟動的服務佔用）
+                    return await self._healthy()
+                await asyncio.sleep(0.2)
+        print(f"PDF 服務在 {self.startup_timeout} 秒內未就緒")
+        return False
+
+    async def render(self, md_file: pathlib.Path) -> pathlib.Path:
+        """將考卷 Markdown 轉成同名 PDF，返回 PDF 路徑；失敗時拋出 PdfRenderError"""
+        pdf_file = md_file.with_suffix(".pdf")
+        if await self.start():
+            try:
+                resp = await self._http().post(
+                    "/render",
+                    json={"input": str(md_file.resolve()), "output": str(pdf_file.resolve())},
+                )
+            except httpx.HTTPError as e:
+                print(f"PDF 服務呼叫失敗，改用一次性轉換: {e}")
+            else:
+                if resp.status_code == 200:
+                    return pdf_file
+                error = self._error_message(resp)
+                if resp.status_code == 503:
+                    raise PdfServiceBusy(error, self._retry_after(resp))
+                raise PdfRenderError(error)
+        await self._render_cli(md_file)
+        return pdf_file
+
+    @staticmethod
+    def _error_message(resp: httpx.Response) -> str:
+        """服務回應的錯誤訊息；回應不是 JSON 時（例如 proxy 錯誤頁、程序當掉的空回應）改用原始內容"""
+        try:
+            body = resp.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and body.get("error"):
+            return str(body["error"])
+        return resp.text or f"PDF 服務回應 HTTP {resp.status_code}"
+
+    @staticmethod
+    def _retry_after(resp: httpx.Response) -> int:
+        try:
+            return max(1, int(resp.headers.get("Retry-After", DEFAULT_RETRY_AFTER)))
+        except ValueError:
+            return DEFAULT_RETRY_AFTER
+
+    async def _render_cli(self, md_file: pathlib.Path) -> None:
+        """一次性轉換（不阻塞 event loop）"""
+        if self._fallback_semaphore is None:
+            self._fallback_semaphore = asyncio.Semaphore(self._fallback_concurrency)
+        async with self._fallback_semaphore:
+            proc = await asyncio.create_subprocess_exec(
+                "node", str(self.cli_script), str(md_file),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise PdfRenderError(f"PDF 轉換逾時（{self.timeout} 秒）")
+        if proc.returncode != 0:
+            raise PdfRenderError(stderr.decode("utf-8", errors="replace"))
+
+    async def stop(self) -> None:
+        """關閉連線；由本服務啟動的 pdf-server.js 一併結束"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._process is not None and self._process.returncode is None:
+            self._process.terminate()
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                self._process.kill()
+        self._process = None
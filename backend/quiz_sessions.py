@@ -0,0 +1,175 @@
+"""
+答題階段（quiz session）
+學生開啟考卷時建立一筆作答紀錄，交卷時以此核對考卷版本並防止重複交卷。
+答案表本身由 ExamCache 以考卷為單位載入一次、留在記憶體，這裡只存每位學生的小筆紀錄；
+紀錄放在 SQLite，多個 worker 程序時由任何一個開卷、另一個交卷都查得到。
+"""
+
+import time
+import sqlite3
+import pathlib
+import secrets
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+    session_id TEXT PRIMARY KEY,
+    exam_id TEXT NOT NULL,
+    exam_signature TEXT NOT NULL,
+    student_id TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    submitted_at REAL,
+    correct_count INTEGER,
+    score INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_expires ON quiz_sessions (expires_at);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_created ON quiz_sessions (created_at);
+"""
+
+FIELDS = (
+    "session_id", "exam_id", "exam_signature", "student_id", "created_at",
+    "expires_at", "submitted_at", "correct_count", "score",
+)
+
+
+class SessionError(Exception):
+    """作答階段無法交卷；reason 為 not_found / expired / submitted / exam_mismatch"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def format_signature(signature: Tuple[int, int]) -> str:
+    """考卷檔案簽章 (mtime_ns, size) 轉成字串存檔"""
+    return f"{signature[0]}:{signature[1]}"
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat() if ts is not None else None
+
+
+class QuizSessionStore:
+    """
+    作答階段紀錄（SQLite，每次操作使用獨立連線）
+
+    - ttl：開卷後多少秒內可以交卷，過期的紀錄會被清除
+    - max_sessions：保留的紀錄上限，超過時先刪除最舊的紀錄，讓資料庫大小有上限
+    - 每開啟 prune_every 次檢查一次過期與上限（不必每次開卷都掃描）
+    """
+
+    def __init__(
+        self,
+        db_path: pathlib.Path,
+        ttl: float = 3 * 3600,
+        max_sessions: int = 50000,
+        prune_every: int = 200,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.prune_every = max(1, prune_every)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # 作答紀錄可以承受斷電時遺失最後幾筆，換取開卷高峰時每次寫入不必 fsync
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def open(self, exam_id: str, signature: Tuple[int, int], student_id: Optional[str] = None) -> Dict:
+        """建立作答階段，返回 {session_id, expires_at}"""
+        session_id = secrets.token_urlsafe(16)
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO quiz_sessions (session_id, exam_id, exam_signature, student_id, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (session_id, exam_id, format_signature(signature), student_id, now, expires_at),
+            )
+        with self._lock:
+            self._opened += 1
+            prune = self._opened % self.prune_every == 0
+        if prune:
+            self.prune()
+        return {"session_id": session_id, "expires_at": _iso(expires_at)}
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """取得作答階段（含已交卷的成績）；不存在或已過期時返回 None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(FIELDS)} FROM quiz_sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        session = dict(zip(FIELDS, row))
+        for key in ("created_at", "expires_at", "submitted_at"):
+            session[key] = _iso(session[key])
+        return session
+
+    def check(self, session_id: str, exam_id: str) -> str:
+        """確認可以交卷，返回開卷時的考卷簽章；不行時拋出 SessionError"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT exam_id, exam_signature, expires_at, submitted_at FROM quiz_sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            raise SessionError("not_found")
+        session_exam_id, signature, expires_at, submitted_at = row
+        if session_exam_id != exam_id:
+            raise SessionError("exam_mismatch")
+        if expires_at <= time.time():
+            raise SessionError("expired")
+        if submitted_at is not None:
+            raise SessionError("submitted")
+        return signature
+
+    def submit(self, session_id: str, correct_count: int, score: int) -> None:
+        """記錄成績；同一個作答階段只能交卷一次（並行重複交卷時只有一個成功）"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE quiz_sessions SET submitted_at = ?, correct_count = ?, score = ?
+                WHERE session_id = ? AND submitted_at IS NULL
+                """,
+                (time.time(), correct_count, score, session_id),
+            )
+        if cursor.rowcount != 1:
+            raise SessionError("submitted")
+
+    def prune(self) -> int:
+        """刪除過期的紀錄，並把總數壓回 max_sessions 以內；返回刪除筆數"""
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM quiz_sessions WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            deleted += conn.execute(
+                """
+                DELETE FROM quiz_sessions WHERE session_id IN (
+                    SELECT session_id FROM quiz_sessions ORDER BY created_at
+                    LIMIT max(0, (SELECT COUNT(*) FROM quiz_sessions) - ?)
+                )
+                """,
+                (self.max_sessions,),
+            ).rowcount
+        return deleted
@@ -0,0 +1,224 @@
+"""
+出題抽樣
+在題庫串流上做水庫抽樣（記憶體只與抽出的題數有關），支援：
+- 依標籤分層抽樣（題庫題目可加 <!-- tags: topic=..., difficulty=... -->）
+- 同一份考卷不重複出題（題庫不足時才整輪重複使用）
+- 學生近期考卷不重複（紀錄存在 SQLite）
+- 可指定 seed，讓大量出題可以重現
+"""
+
+import heapq
+import time
+import random
+import sqlite3
+import pathlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bank_store import BankStore, question_hash
+
+
+def make_rng(seed: Optional[int] = None) -> random.Random:
+    """建立抽題用的亂數產生器；seed 相同（且學生紀錄相同）時抽出的題目與順序相同"""
+    return random.Random(seed)
+
+
+class _Reservoir:
+    """
+    單一層的抽樣器
+
+    未出現在 recent 中的題目做水庫抽樣（最多 k 題）；近期出過的題目只保留
+    最久以前出過的 k 題，新題不夠時才拿來補。
+    """
+
+    def __init__(self, k: int, rng: random.Random, recent: Dict[str, float]):
+        self.k = k
+        self.rng = rng
+        self.recent = recent
+        self.fresh: List[dict] = []
+        self.fresh_seen = 0
+        self.stale: List[Tuple[float, float, int, dict]] = []  # 最大堆積：(-used_at, -tiebreak, seq, q)
+        self.seq = 0
+
+    def offer(self, q: dict) -> None:
+        if self.k <= 0:
+            return
+        used_at = self.recent.get(question_hash(q)) if self.recent else None
+        if used_at is None:
+            if self.fresh_seen < self.k:
+                self.fresh.append(q)
+            else:
+                j = self.rng.randrange(self.fresh_seen + 1)
+                if j < self.k:
+                    self.fresh[j] = q
+            self.fresh_seen += 1
+            return
+        # 越早出過的越優先；同時間出過的隨機取捨
+        self.seq += 1
+        item = (-used_at, -self.rng.random(), self.seq, q)
+        if len(self.stale) < self.k:
+            heapq.heappush(self.stale, item)
+        elif item > self.stale[0]:
+            heapq.heapreplace(self.stale, item)
+
+    def result(self) -> List[dict]:
+        chosen = list(self.fresh)
+        if len(chosen) < self.k and self.stale:
+            oldest_first = sorted(self.stale, reverse=True)
+            chosen.extend(item[3] for item in oldest_first[:self.k - len(chosen)])
+        return chosen
+
+
+def _allocate(k: int, sizes: Dict[str, int]) -> Dict[str, int]:
+    """依各層題數比例分配 k 題（最大餘數法），每層不超過該層題數"""
+    quotas = {key: 0 for key in sizes}
+    remaining = min(k, sum(sizes.values()))
+    while remaining > 0:
+        capacity = {key: sizes[key] - quotas[key] for key in sizes if sizes[key] > quotas[key]}
+        total = sum(capacity.values())
+        shares = {key: remaining * size / total for key, size in capacity.items()}
+        given = 0
+        for key, share in shares.items():
+            quotas[key] += int(share)
+            given += int(share)
+        leftover = remaining - given
+        for key in sorted(shares, key=lambda key: shares[key] - int(shares[key]), reverse=True)[:leftover]:
+            quotas[key] += 1
+        remaining = min(k, sum(sizes.values())) - sum(quotas.values())
+    return quotas
+
+
+def tag_of(q: dict, key: str) -> str:
+    """題目的標籤值；沒有標籤時為空字串"""
+    return (q.get("tags") or {}).get(key, "")
+
+
+class ExamSampler:
+    """從題庫抽題（經由 BankStore，大題庫以串流方式讀取）"""
+
+    def __init__(self, store: BankStore):
+        self.store = store
+
+    def sample(
+        self,
+        bank_path: pathlib.Path,
+        k: int,
+        rng: Optional[random.Random] = None,
+        recent: Optional[Dict[str, float]] = None,
+        stratify_by: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        抽出 k 題
+
+        Args:
+            bank_path: 題庫檔
+            k: 題數
+            rng: 亂數產生器（make_rng(seed)）；None 時使用新的隨機來源
+            recent: 學生近期出過的題目 {題目雜湊: 出題時間}，優先避開，不夠時先用最早出過的
+            stratify_by: 依此標籤（如 "topic"、"difficulty"）按比例分層抽樣
+
+        Returns:
+            題目列表（順序已打亂）。題庫不足 k 題時，先用完全部題目，再整輪重複使用。
+        """
+        rng = rng or make_rng()
+        recent = recent or {}
+        if k <= 0:
+            return []
+
+        if stratify_by:
+            sizes: Dict[str, int] = {}
+            for q in self.store.iter_questions(bank_path):
+                key = tag_of(q, stratify_by)
+                sizes[key] = sizes.get(key, 0) + 1
+            quotas = _allocate(k, sizes)
+            reservoirs = {key: _Reservoir(n, rng, recent) for key, n in quotas.items()}
+            for q in self.store.iter_questions(bank_path):
+                reservoirs[tag_of(q, stratify_by)].offer(q)
+            chosen = [q for key in sorted(reservoirs) for q in reservoirs[key].result()]
+        else:
+            reservoir = _Reservoir(k, rng, recent)
+            for q in self.store.iter_questions(bank_path):
+                reservoir.offer(q)
+            chosen = reservoir.result()
+
+        if not chosen:
+            return []
+        if len(chosen) < k:
+            # 題庫不足：整份題庫用過一輪後才重複，每輪內不重複
+            pool = list(chosen)
+            while len(chosen) < k:
+                chosen.extend(rng.sample(pool, min(len(pool), k - len(chosen))))
+        rng.shuffle(chosen)
+        return chosen
+
+
+class SampleHistory:
+    """學生出題紀錄（SQLite，每次操作使用獨立連線）"""
+
+    def __init__(self, db_path: pathlib.Path, max_exams: int = 20):
+        self.db_path = db_path
+        self.max_exams = max_exams
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS student_history (
+                    student_id TEXT NOT NULL,
+                    exam_id TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    qhash TEXT NOT NULL,
+                    used_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_student ON student_history (student_id, used_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def recent(self, student_id: str, subject: str, exams: int) -> Dict[str, float]:
+        """學生最近 exams 份考卷中出過的該科題目 {題目雜湊: 最後出題時間}"""
+        if exams <= 0:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT qhash, MAX(used_at) FROM student_history
+                WHERE student_id = ? AND subject = ? AND exam_id IN (
+                    SELECT exam_id FROM student_history WHERE student_id = ?
+                    GROUP BY exam_id ORDER BY MAX(used_at) DESC LIMIT ?
+                )
+                GROUP BY qhash
+                """,
+                (student_id, subject, student_id, exams),
+            ).fetchall()
+        return {qhash: used_at for qhash, used_at in rows}
+
+    def record(self, student_id: str, exam_id: str, picked: Iterable[Tuple[dict, str]]) -> None:
+        """記錄一份考卷用到的題庫原題 (題目, 科目)，並只保留最近 max_exams 份"""
+        now = time.time()
+        rows = [(student_id, exam_id, subject, question_hash(q), now) for q, subject in picked]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO student_history (student_id, exam_id, subject, qhash, used_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                """
+                DELETE FROM student_history
+                WHERE student_id = ? AND exam_id NOT IN (
+                    SELECT exam_id FROM student_history WHERE student_id = ?
+                    GROUP BY exam_id ORDER BY MAX(used_at) DESC LIMIT ?
+                )
+                """,
+                (student_id, student_id, self.max_exams),
+            )
@@ -0,0 +1,212 @@
+"""
+題目變型池
+將 LLM 改寫好的變型題存在 SQLite，以 (科目, 題庫題目雜湊) 為索引；
+出題時直接從池中取用，池空了才即時呼叫 LLM。背景補充器負責讓每題維持 N 個變型。
+"""
+
+import json
+import time
+import sqlite3
+import pathlib
+import threading
+from contextlib import contextmanager
+from typing import IO, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows：沒有 flock，視為單一程序
+    fcntl = None
+
+from bank_store import question_hash
+
+
+VALID_LABELS = ("A", "B", "C", "D")
+
+
+def is_valid_variant(v: Optional[dict]) -> bool:
+    """檢查變型題格式：題目非空、4 個不重複的非空選項、答案為 A~D"""
+    if not isinstance(v, dict):
+        return False
+    question = v.get("question")
+    options = v.get("options")
+    if not isinstance(question, str) or not question.strip():
+        return False
+    if not isinstance(options, list) or len(options) != 4:
+        return False
+    if not all(isinstance(o, str) and o.strip() for o in options):
+        return False
+    if len(set(o.strip() for o in options)) != 4:
+        return False
+    return v.get("correct_answer") in VALID_LABELS
+
+
+class VariantPool:
+    """SQLite 變型池（每次操作使用獨立連線，可跨執行緒、跨程序共用）"""
+
+    def __init__(self, db_path: pathlib.Path):
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS variants (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subject TEXT NOT NULL,
+                    qhash TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_variants_key ON variants (subject, qhash, id)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def add(self, subject: str, q: dict, variant: dict) -> bool:
+        """加入一個變型；格式不合格時不加入並返回 False"""
+        if not is_valid_variant(variant):
+            return False
+        payload = json.dumps(
+            {k: variant[k] for k in ("question", "options", "correct_answer")},
+            ensure_ascii=False,
+        )
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO variants (subject, qhash, payload, created_at) VALUES (?, ?, ?, ?)",
+                (subject, question_hash(q), payload, time.time()),
+            )
+        return True
+
+    def take(self, subject: str, q: dict) -> Optional[dict]:
+        """取出（並移除）該題最舊的一個變型；池中沒有時返回 None"""
+        with self._connect() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id, payload FROM variants WHERE subject = ? AND qhash = ? ORDER BY id LIMIT 1",
+                    (subject, question_hash(q)),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM variants WHERE id = ?", (row[0],))
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                print(f"變型池讀取失敗: {e}")
+                return None
+        if row is None:
+            return None
+        return json.loads(row[1])
+
+    def count(self, subject: str, q: dict) -> int:
+        """該題目前在池中的變型數"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM variants WHERE subject = ? AND qhash = ?",
+                (subject, question_hash(q)),
+            ).fetchone()
+        return row[0]
+
+    def counts_by_subject(self) -> Dict[str, int]:
+        """各科池中的變型總數"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT subject, COUNT(*) FROM variants GROUP BY subject"
+            ).fetchall()
+        return {subject: n for subject, n in rows}
+
+
+class VariantRefiller:
+    """
+    背景補充器
+
+    週期性地掃描題庫，讓每題在池中至少有 target 個合格變型。
+    每次 LLM 呼叫之間間隔 delay 秒，避免超過免費額度的 RPM 限制。
+    指定 lock_path 時，多個 worker 程序中只有取得檔案鎖的那一個會補充，
+    其他程序每隔 interval 秒再試一次（負責的程序結束時鎖會自動釋放）。
+    """
+
+    def __init__(
+        self,
+        pool: VariantPool,
+        questions: Callable[[], Iterable[Tuple[str, dict]]],
+        generate: Callable[[dict, str], Optional[dict]],
+        target: int = 3,
+        delay: float = 1.0,
+        interval: float = 300.0,
+        lock_path: Optional[pathlib.Path] = None,
+    ):
+        self.pool = pool
+        self._questions = questions
+        self._generate = generate
+        self.target = target
+        self.delay = delay
+        self.interval = interval
+        self.lock_path = lock_path
+        self._lock_file: Optional[IO] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refill_once(self) -> int:
+        """補充一輪，返回新增的變型數"""
+        added = 0
+        for subject, q in self._questions():
+            missing = self.target - self.pool.count(subject, q)
+            for _ in range(missing):
+                if self._stop.is_set():
+                    return added
+                variant = self._generate(q, subject)
+                if self.pool.add(subject, q, variant):
+                    added += 1
+                if self._stop.wait(self.delay):
+                    return added
+        return added
+
+    def _acquire_leader(self) -> bool:
+        """嘗試取得補充器的檔案鎖；已取得或不需要鎖時返回 True"""
+        if self.lock_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self._acquire_leader():
+                self._stop.wait(self.interval)
+                continue
+            try:
+                added = self.refill_once()
+                if added:
+                    print(f"變型池補充完成，新增 {added} 題")
+            except Exception as e:
+                print(f"變型池補充失敗: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="variant-refiller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,169 @@
+"""
+題目變型引擎
+將多題的 LLM 改寫平行送出（有併發上限與逐題逾時），失敗或逾時的題目改用選項打亂
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple
+
+
+# (原題, 科目)
+VariationJob = Tuple[dict, str]
+ProgressCallback = Callable[[int, int], None]
+
+
+class VariationEngine:
+    """
+    非同步題目變型引擎
+
+    - 阻塞式的 SDK 呼叫在共用的執行緒池中執行，不會卡住 event loop
+    - concurrency：單次出題同時進行的改寫數（批次模式下為同時進行的批次數）
+    - timeout：每次 LLM 呼叫的逾時秒數，逾時改用 fallback
+    - batch_size：大於 1 且提供 rewrite_batch 時，同科目的題目每 batch_size 題合併成一次呼叫
+    - batch_timeout：批次呼叫依題數計算的逾時秒數（未提供時與單題相同）
+    - take：現成變型的來源（例如變型池），在逾時計算之外先取用，只有沒取到的題目才送去改寫；
+      取出即移除的變型不會因為後續 LLM 呼叫逾時或失敗而遺失
+    """
+
+    def __init__(
+        self,
+        rewrite: Callable[[dict, str], dict],
+        fallback: Callable[[dict], dict],
+        concurrency: int = 4,
+        timeout: float = 30.0,
+        max_workers: int = 16,
+        rewrite_batch: Optional[Callable[[List[dict], str], List[dict]]] = None,
+        batch_size: int = 1,
+        batch_timeout: Optional[Callable[[int], float]] = None,
+        take: Optional[Callable[[dict, str], Optional[dict]]] = None,
+    ):
+        self._rewrite = rewrite
+        self._take = take
+        self._rewrite_batch = rewrite_batch
+        self._fallback = fallback
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+        self._batch_timeout = batch_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(self.concurrency, max_workers),
+            thread_name_prefix="llm-variation",
+        )
+
+    def _take_all(self, qs: List[dict], subject: str) -> List[Optional[dict]]:
+        results: List[Optional[dict]] = [None] * len(qs)
+        if self._take is None:
+            return results
+        for i, q in enumerate(qs):
+            try:
+                results[i] = self._take(q, subject)
+            except Exception as e:
+                print(f"取用現成變型失敗: {e}")
+        return results
+
+    async def _run_one(self, semaphore: asyncio.Semaphore, q: dict, subject: str) -> dict:
+        loop = asyncio.get_running_loop()
+        taken = (await loop.run_in_executor(self._executor, self._take_all, [q], subject))[0]
+        if taken is not None:
+            return taken
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._rewrite, q, subject),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                print(f"LLM 改寫逾時（{self.timeout} 秒），使用原題並打亂選項")
+            except Exception as e:
+                print(f"LLM 改寫失敗: {e}，使用原題並打亂選項")
+        return self._fallback(q)
+
+    async def _run_batch(self, semaphore: asyncio.Semaphore, qs: List[dict], subject: str) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self._executor, self._take_all, qs, subject)
+        missing = [i for i, r in enumerate(results) if r is None]
+        if not missing:
+            return results
+        pending = [qs[i] for i in missing]
+        timeout = self._batch_timeout(len(pending)) if self._batch_timeout else self.timeout
+        rewritten = None
+        async with semaphore:
+            try:
+                rewritten = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._rewrite_batch, pending, subject),
+                    timeout=timeout,
+                )
+                if len(rewritten) != len(pending):
+                    print(f"批次改寫回傳 {len(rewritten)} 題，預期 {len(pending)} 題，整批改用選項打亂")
+                    rewritten = None
+            except asyncio.TimeoutError:
+                print(f"批次改寫逾時（{timeout:g} 秒），{len(pending)} 題使用原題並打亂選項")
+            except Exception as e:
+                print(f"批次改寫失敗: {e}，{len(pending)} 題使用原題並打亂選項")
+        if rewritten is None:
+            rewritten = [self._fallback(q) for q in pending]
+        for i, r in zip(missing, rewritten):
+            results[i] = r
+        return results
+
+    def _batches(self, jobs: Sequence[VariationJob]) -> List[Tuple[str, List[int]]]:
+        """將 jobs 依科目分組，每組切成最多 batch_size 題，返回 (科目, 索引列表)"""
+        by_subject: dict = {}
+        for index, (_, subject) in enumerate(jobs):
+            by_subject.setdefault(subject, []).append(index)
+        batches = []
+        for subject, indices in by_subject.items():
+            for start in range(0, len(indices), self.batch_size):
+                batches.append((subject, indices[start:start + self.batch_size]))
+        return batches
+
+    async def stream(self, jobs: Sequence[VariationJob]) -> AsyncIterator[Tuple[int, dict]]:
+        """平行改寫，依完成先後產出 (在 jobs 中的索引, 變型結果)；中途停止迭代時取消其餘工作"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(index: int, q: dict, subject: str) -> List[Tuple[int, dict]]:
+            return [(index, await self._run_one(semaphore, q, subject))]
+
+        async def run_batch(subject: str, indices: List[int]) -> List[Tuple[int, dict]]:
+            results = await self._run_batch(semaphore, [jobs[i][0] for i in indices], subject)
+            return list(zip(indices, results))
+
+        if self.batch_size > 1 and self._rewrite_batch is not None:
+            tasks = [asyncio.ensure_future(run_batch(s, idx)) for s, idx in self._batches(jobs)]
+        else:
+            tasks = [asyncio.ensure_future(run(i, q, s)) for i, (q, s) in enumerate(jobs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for item in await next_done:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def vary(
+        self,
+        jobs: Sequence[VariationJob],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> List[dict]:
+        """平行改寫所有題目，結果順序與 jobs 相同"""
+        total = len(jobs)
+        results: List[Optional[dict]] = [None] * total
+        done = 0
+        async for index, result in self.stream(jobs):
+            results[index] = result
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+        return results
+
+    def vary_sync(
+        self,
+        jobs: Sequence[VariationJob],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> List[dict]:
+        """同步版本，供執行緒中的出題流程使用（不可在 event loop 內呼叫）"""
+        return asyncio.run(self.vary(jobs, on_progress))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -2,20 +2,36 @@
  * PM2 生態檔 - Mock Exam Tutor
  * 使用方式：
  *   pm2 start ecosystem.config.cjs
+ *   BACKEND_WORKERS=4 pm2 start ecosystem.config.cjs   # 後端以 gunicorn 啟動 4 個 worker
  *   pm2 stop all
  *   pm2 restart all
  *   pm2 logs
  */
 
+// 大於 1 時改用 gunicorn 管理多個 uvicorn worker（設定見 backend/gunicorn.conf.py）
+const BACKEND_WORKERS = parseInt(process.env.BACKEND_WORKERS || '1', 10);
+
 module.exports = {
   apps: [
     {
       name: 'mock-exam-backend',
       cwd: './backend',
       script: 'venv/bin/python',
-      args: '-m uvicorn main:app --host 0.0.0.0 --port 8000',
+      args: BACKEND_WORKERS > 1
+        ? '-m gunicorn -c gunicorn.conf.py main:app'
+        : '-m uvicorn main:app --host 0.0.0.0 --port 8000',
       interpreter: 'none',
-      env: { NODE_ENV: 'development' },
+      env: { NODE_ENV: 'development', BACKEND_WORKERS },
+      watch: false,
+      autorestart: true,
+      max_restarts: 10,
+      min_uptime: '2s',
+    },
+    {
+      // PDF 轉換常駐服務（後端在服務未啟動時也會自動帶起）
+      name: 'mock-exam-pdf',
+      script: 'scripts/pdf-server.js',
+      env: { PDF_SERVICE_PORT: 3100, PDF_CONCURRENCY: 2 },
       watch: false,
       autorestart: true,
       max_restarts: 10,
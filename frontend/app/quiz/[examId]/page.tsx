@@ -24,6 +24,7 @@ interface ExamData {
   subject: string
   questions: Question[]
   total_questions: number
+  session_id: string
 }
 
 export default function QuizPage() {
@@ -50,7 +51,8 @@ export default function QuizPage() {
         title: response.title,
         subject: response.subject,
         total_questions: response.total_questions,
-        questions: response.questions
+        questions: response.questions,
+        session_id: response.session_id
       })
       setLoading(false)
     } catch (error) {
@@ -93,7 +95,7 @@ export default function QuizPage() {
       }))
       
       // 提交答案
-      const result = await apiClient.submitQuiz(examId, answersList)
+      const result = await apiClient.submitQuiz(examId, answersList, examData!.session_id)
       
       // 將結果存入 localStorage，供結果頁面讀取
       localStorage.setItem(`quiz_result_${examId}`, JSON.stringify(result))
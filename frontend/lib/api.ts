@@ -17,18 +17,37 @@ export interface Exam {
   created_at: string
   file_size: number
   has_pdf: boolean
+  subject?: 'chinese' | 'english' | 'math' | 'mixed' | null
 }
 
 export interface ExamRequest {
   subject: string
   num_questions: number
   difficulty?: string
+  student_id?: string
+  seed?: number
+  stratify_by?: string
 }
 
 export interface MixedExamRequest {
   chinese_count: number
   english_count: number
   math_count: number
+  student_id?: string
+  seed?: number
+  stratify_by?: string
+}
+
+export interface BulkExamRequest {
+  subject: string
+  num_questions?: number
+  chinese_count?: number
+  english_count?: number
+  math_count?: number
+  count?: number
+  student_ids?: string[]
+  seed?: number
+  stratify_by?: string
 }
 
 export interface ExamResponse {
@@ -39,6 +58,31 @@ export interface ExamResponse {
   download_url?: string
 }
 
+export interface JobStatus {
+  job_id: string
+  kind: string
+  status: 'queued' | 'running' | 'done' | 'failed'
+  progress_done: number
+  progress_total: number
+  result?: ExamResponse | null
+  error?: string | null
+  created_at: string
+  updated_at: string
+}
+
+export type ExamStreamEvent =
+  | { event: 'start'; data: { exam_id: string; total_questions: number } }
+  | {
+      event: 'question'
+      data: {
+        id: number
+        subject: string
+        question: string
+        options: Array<{ label: string; text: string }>
+      }
+    }
+  | { event: 'done'; data: { exam_id: string; filename: string; download_url: string } }
+
 class ApiClient {
   private baseUrl: string
 
@@ -83,8 +127,25 @@ class ApiClient {
     return this.request<{ subjects: Subject[] }>('/api/subjects')
   }
 
-  async listExams() {
-    return this.request<{ exams: Exam[] }>('/api/exams')
+  async listExams(params?: {
+    subject?: string
+    date_from?: string
+    date_to?: string
+    limit?: number
+    offset?: number
+  }) {
+    const query = new URLSearchParams()
+    Object.entries(params ?? {}).forEach(([key, value]) => {
+      if (value !== undefined) query.set(key, String(value))
+    })
+    const qs = query.toString()
+    return this.request<{ exams: Exam[]; total: number }>(`/api/exams${qs ? `?${qs}` : ''}`)
+  }
+
+  async deleteExam(examId: string) {
+    return this.request<{ success: boolean; exam_id: string }>(`/api/exams/${examId}`, {
+      method: 'DELETE',
+    })
   }
 
   async getExam(examId: string) {
@@ -107,6 +168,79 @@ class ApiClient {
     })
   }
 
+  async submitGenerateJob(request: ExamRequest) {
+    return this.request<JobStatus>('/api/jobs/generate', {
+      method: 'POST',
+      body: JSON.stringify(request),
+    })
+  }
+
+  async submitGenerateMixedJob(request: MixedExamRequest) {
+    return this.request<JobStatus>('/api/jobs/generate-mixed', {
+      method: 'POST',
+      body: JSON.stringify(request),
+    })
+  }
+
+  async submitGenerateBulkJob(request: BulkExamRequest) {
+    return this.request<JobStatus>('/api/jobs/generate-bulk', {
+      method: 'POST',
+      body: JSON.stringify(request),
+    })
+  }
+
+  async getBatchManifest(batchId: string) {
+    return this.request<any>(`/api/batches/${batchId}`)
+  }
+
+  async getJobStatus(jobId: string) {
+    return this.request<JobStatus>(`/api/jobs/${jobId}`)
+  }
+
+  /**
+   * 以 SSE 串流出題：每題變型完成即呼叫 onEvent，不必等整份考卷
+   */
+  async streamGenerateExam(
+    request: ExamRequest | MixedExamRequest,
+    onEvent: (event: ExamStreamEvent) => void
+  ) {
+    const endpoint = 'subject' in request
+      ? '/api/exams/generate/stream'
+      : '/api/exams/generate-mixed/stream'
+    const response = await fetch(`${this.baseUrl}${endpoint}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(request),
+    })
+
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({ detail: 'Unknown error' }))
+      throw new Error(error.detail || `HTTP ${response.status}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let boundary = buffer.indexOf('\n\n')
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        const event = block.match(/^event: (.+)$/m)?.[1]
+        const data = block.match(/^data: (.+)$/m)?.[1]
+        if (event && data) {
+          onEvent({ event, data: JSON.parse(data) } as ExamStreamEvent)
+        }
+        boundary = buffer.indexOf('\n\n')
+      }
+    }
+  }
+
   async generatePdf(examId: string) {
     return this.request<{ success: boolean; exam_id: string; pdf_path: string; message: string }>(
       `/api/exams/${examId}/generate-pdf`,
@@ -126,7 +260,8 @@ class ApiClient {
     }>('/api/stats')
   }
 
-  async getExamForQuiz(examId: string) {
+  async getExamForQuiz(examId: string, studentId?: string) {
+    const query = studentId ? `?student_id=${encodeURIComponent(studentId)}` : ''
     return this.request<{
       exam_id: string
       title: string
@@ -138,10 +273,16 @@ class ApiClient {
         options: Array<{ label: string; text: string }>
       }>
       total_questions: number
-    }>(`/api/quiz/${examId}`)
+      session_id: string
+      expires_at: string
+    }>(`/api/quiz/${examId}${query}`)
   }
 
-  async submitQuiz(examId: string, answers: Array<{ question_id: number; user_answer: string }>) {
+  async submitQuiz(
+    examId: string,
+    answers: Array<{ question_id: number; user_answer: string }>,
+    sessionId: string
+  ) {
     return this.request<{
       exam_id: string
       subject: string
@@ -155,9 +296,10 @@ class ApiClient {
         correct_answer: string
         is_correct: boolean
       }>
+      session_id: string
     }>('/api/quiz/submit', {
       method: 'POST',
-      body: JSON.stringify({ exam_id: examId, answers }),
+      body: JSON.stringify({ exam_id: examId, answers, session_id: sessionId }),
     })
   }
 }
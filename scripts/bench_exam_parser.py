@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+ExamParser 效能測試
+產生大型考卷（預設 500 題），比較單次掃描版 ExamParser 與改寫前版本的解析時間，
+並確認兩者輸出完全相同
+
+用法: python scripts/bench_exam_parser.py [題數] [重複次數]
+"""
+
+import re
+import sys
+import random
+import timeit
+from pathlib import Path
+from typing import Dict
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+GENERATED_DIR = BACKEND_DIR.parent / "exams" / "generated"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from exam_parser import ExamParser  # noqa: E402
+
+
+class LegacyExamParser:
+    """改寫前的 ExamParser（逐題多次 re.match），僅供比對結果與計時"""
+    
+    def __init__(self, markdown_content: str):
+        self.content = markdown_content
+        self.questions = []
+        self.answers = {}
+        
+    def parse(self) -> Dict:
+        # 解析標題
+        title = self._extract_title()
+        
+        # 解析題目
+        self._parse_questions()
+        
+        # 解析答案
+        self._parse_answers()
+        
+        # 合併題目和答案
+        for q in self.questions:
+            q_id = q['id']
+            if q_id in self.answers:
+                q['correct_answer'] = self.answers[q_id]
+        
+        # 判斷科目（如果是綜合卷，根據題目數量判斷）
+        subject = self._determine_subject()
+        
+        return {
+            'title': title,
+            'subject': subject,
+            'questions': self.questions,
+            'total_questions': len(self.questions)
+        }
+    
+    def _extract_title(self) -> str:
+        """提取標題"""
+        match = re.search(r'^#\s+(.+)', self.content, re.MULTILINE)
+        if match:
+            return match.group(1).strip()
+        return "模擬考試"
+    
+    def _determine_subject(self) -> str:
+        """判斷科目"""
+        if '國語' in self.content[:500]:
+            if '英語' in self.content[:500] or '數學' in self.content[:500]:
+                return "綜合科"
+            return "國語科"
+        elif '英語' in self.content[:500] or 'English' in self.content[:500]:
+            return "英語科"
+        elif '數學' in self.content[:500]:
+            return "數學科"
+        return "綜合科"
+    
+    def _parse_questions(self):
+        """解析題目區"""
+        # 找到題目區（在 "參考答案" 或 "### 答案" 之前的內容）
+        question_section = re.split(r'##\s+參考答案|###\s+.*答案', self.content)[0]
+        
+        current_subject = "綜合科"
+        
+        # 更精確的解析方式
+        lines = question_section.split('\n')
+        i = 0
+        
+        while i < len(lines):
+            line = lines[i]
+            
+            # 檢測科目標題（保留中文數字）
+            if re.match(r'##\s+[一二三四五六七八九十]、(.+科)', line):
+                subject_match = re.search(r'##\s+[一二三四五六七八九十]、(.+科)', line)
+                if subject_match:
+                    current_subject = subject_match.group(1)
+                i += 1
+                continue
+            
+            # 檢測題目開頭（數字. 開頭，但要小心縮排）
+            # 題目可能有縮排空格
+            question_match = re.match(r'^(\d+)\.\s+(.+)', line)
+            if question_match:
+                q_id = int(question_match.group(1))
+                q_text = question_match.group(2)
+                
+                # 移除 <br> 標籤
+                q_text = q_text.replace('<br>', '').strip()
+                
+                # 向下查找選項（選項前面可能有空格縮排）
+                i += 1
+                options = []
+                
+                while i < len(lines):
+                    # 不要 strip，保留原始格式以檢查縮排
+                    option_line = lines[i]
+                    option_line_stripped = option_line.strip()
+                    
+                    # 如果是空行，跳過
+                    if not option_line_stripped:
+                        i += 1
+                        # 空行可能代表選項結束
+                        if len(options) >= 4:
+                            break
+                        continue
+                    
+                    # 匹配選項 (A) ... 或 (B) ... 等（允許前面有空格）
+                    option_match = re.match(r'^\s*\(([A-D])\)\s+(.+)', option_line)
+                    if option_match:
+                        label = option_match.group(1)
+                        text = option_match.group(2).strip()
+                        options.append({
+                            'label': label,
+                            'text': text
+                        })
+                        i += 1
+                        
+                        # 如果已經收集到 4 個選項，結束
+                        if len(options) >= 4:
+                            break
+                    elif option_line_stripped.startswith('#'):
+                        # 遇到新的標題，結束
+                        break
+                    elif re.match(r'^\d+\.', option_line_stripped):
+                        # 遇到新的題目，結束
+                        break
+                    else:
+                        # 其他情況：可能是題目的延續
+                        if not options:
+                            q_text += ' ' + option_line_stripped
+                        i += 1
+                
+                # 確保有 4 個選項才加入
+                if len(options) == 4:
+                    self.questions.append({
+                        'id': q_id,
+                        'subject': current_subject,
+                        'question': q_text,
+                        'options': options
+                    })
+                # 不要 continue，讓 i 保持在當前位置
+                continue
+            
+            i += 1
+    
+    def _parse_answers(self):
+        """解析答案區（從表格中提取）"""
+        # 找到答案區
+        answer_section_match = re.search(r'##\s+參考答案(.+?)$', self.content, re.DOTALL)
+        if not answer_section_match:
+            return
+        
+        answer_section = answer_section_match.group(1)
+        
+        # 匹配表格中的答案行
+        # 格式: | 1 | (B) | 2.5 | ...
+        pattern = r'\|\s*(\d+)\s*\|\s*\(([A-D])\)'
+        
+        for match in re.finditer(pattern, answer_section):
+            q_id = int(match.group(1))
+            answer = match.group(2)
+            self.answers[q_id] = answer
+
+
+def build_exam(num_questions: int, seed: int = 0) -> str:
+    """產生與 _write_mixed_exam_file 相同格式的綜合考卷"""
+    rng = random.Random(seed)
+    sections = [("一、國語科", "國語科"), ("二、英語科", "英語科"), ("三、數學科", "數學科")]
+    per_section = [num_questions // 3] * 3
+    per_section[0] += num_questions - sum(per_section)
+    lines = [
+        "# 私立國中入學模擬考 - 綜合版",
+        "",
+        "- 年級：小六升國一",
+        "- 科目：國語、英語、數學",
+        "- 測驗時間：80 分鐘",
+        "- 滿分：100 分",
+        "",
+        "---",
+        "",
+    ]
+    q_id = 1
+    answers = []
+    for (header, label), count in zip(sections, per_section):
+        lines.extend([f"## {header}", "", "### 題目區", ""])
+        for _ in range(count):
+            lines.append(f"{q_id}. 第 {q_id} 題：計算 {rng.randint(1, 999)} + {rng.randint(1, 999)} 的結果為何？<br>")
+            lines.append("")
+            for option in "ABCD":
+                lines.append(f"   ({option}) {rng.randint(1, 2000)}")
+            lines.append("")
+            answers.append((q_id, label, rng.choice("ABCD")))
+            q_id += 1
+        lines.extend(["---", ""])
+    lines.extend(["## 參考答案", ""])
+    for _, label in sections:
+        lines.extend([f"### {label}答案", "", "| 題號 | 答案 | 配分 | 考點 |", "|------|------|------|------|"])
+        lines.extend(f"| {i} | ({ans}) | 2 | 題庫出題 |" for i, sec, ans in answers if sec == label)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    # 1. 輸出一致性：合成考卷 + exams/generated/ 中的既有考卷
+    samples = {f"合成考卷（{num_questions} 題）": build_exam(num_questions)}
+    for md_file in sorted(GENERATED_DIR.glob("*.md")):
+        samples[md_file.name] = md_file.read_text(encoding="utf-8")
+    for name, content in samples.items():
+        same = ExamParser(content).parse() == LegacyExamParser(content).parse()
+        print(f"{'✓' if same else '✗'} 輸出一致：{name}")
+        if not same:
+            sys.exit(1)
+
+    # 2. 計時
+    content = samples[f"合成考卷（{num_questions} 題）"]
+    legacy = min(timeit.repeat(lambda: LegacyExamParser(content).parse(), number=1, repeat=repeat))
+    current = min(timeit.repeat(lambda: ExamParser(content).parse(), number=1, repeat=repeat))
+    print(f"\n{num_questions} 題，{len(content)} 字元，取 {repeat} 次中最快者：")
+    print(f"  改寫前：{legacy * 1000:.2f} ms")
+    print(f"  單次掃描：{current * 1000:.2f} ms")
+    print(f"  加速：{legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
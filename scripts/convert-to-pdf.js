@@ -1,6 +1,7 @@
 const puppeteer = require('puppeteer');
 const path = require('path');
 const fs = require('fs');
+const { LatexSvgCache } = require('./latex-svg-cache');
 
 // 使用 MathJax 將 LaTeX 轉換為 SVG
 const { mathjax } = require('mathjax-full/js/mathjax.js');
@@ -18,11 +19,15 @@ const tex = new TeX({ packages: AllPackages });
 const svg = new SVG({ fontCache: 'none' });
 const mjaxDoc = mathjax.document('', { InputJax: tex, OutputJax: svg });
 
-function texToSvg(texStr, inline = true) {
+function typesetSvg(texStr, inline = true) {
     const node = mjaxDoc.convert(texStr, { display: !inline });
     return adaptor.outerHTML(node);
 }
 
+// 相同公式只排版一次（磁碟快取跨執行、跨程序共用）
+const svgCache = new LatexSvgCache();
+const texToSvg = svgCache.wrap(typesetSvg);
+
 // 將 Markdown 中的 LaTeX 公式轉換為 SVG
 function convertLatexToSvg(markdown) {
     // 處理行內公式 $...$
@@ -54,51 +59,70 @@ function convertLatexToSvg(markdown) {
 const markdownIt = require('markdown-it');
 const md = markdownIt({ html: true, linkify: false, typographer: false });
 
-async function convertToPdf(inputFile) {
-    try {
-        console.log('正在讀取 Markdown 檔案...');
-        let markdown = fs.readFileSync(inputFile, 'utf-8');
-
-        console.log('正在將 LaTeX 公式轉換為 SVG...');
-        markdown = convertLatexToSvg(markdown);
-
-        console.log('正在轉換 Markdown 為 HTML...');
-        let html = md.render(markdown);
-
-        // 處理圖片路徑 - 將相對路徑轉換為 Base64 嵌入
-        const inputDir = path.dirname(path.resolve(inputFile));
-        const imagesDir = path.resolve(inputDir, '..', 'images');
-        
-        html = html.replace(
-            /src="\.\.\/images\/([^"]+)"/g,
-            (match, filename) => {
-                const imagePath = path.join(imagesDir, filename);
-                
-                // 檢查圖片是否存在
-                if (!fs.existsSync(imagePath)) {
-                    console.log(`  ✗ 圖片不存在：${filename}`);
-                    return match;
-                }
-                
-                // 讀取圖片並轉換為 Base64
-                const imageBuffer = fs.readFileSync(imagePath);
-                const base64Image = imageBuffer.toString('base64');
-                const ext = path.extname(filename).toLowerCase();
-                const mimeType = ext === '.png' ? 'image/png' : 
-                                ext === '.jpg' || ext === '.jpeg' ? 'image/jpeg' : 
-                                ext === '.svg' ? 'image/svg+xml' : 'image/png';
-                
-                console.log(`  ✓ 圖片：${filename} (${(imageBuffer.length / 1024).toFixed(1)} KB)`);
-                return `src="data:${mimeType};base64,${base64Image}"`;
+const PDF_OPTIONS = {
+    format: 'A4',
+    margin: {
+        top: '20mm',
+        right: '15mm',
+        bottom: '20mm',
+        left: '15mm'
+    },
+    printBackground: true,
+    displayHeaderFooter: true,
+    headerTemplate: '<div></div>',
+    footerTemplate: `
+        <div style="font-size: 10px; text-align: center; width: 100%; padding: 5px;">
+            <span class="pageNumber"></span> / <span class="totalPages"></span>
+        </div>
+    `
+};
+
+// 考卷 Markdown 對應的 PDF 路徑（同目錄、同檔名）
+function defaultOutputPath(inputFile) {
+    return /\.md$/i.test(inputFile) ? inputFile.replace(/\.md$/i, '.pdf') : `${inputFile}.pdf`;
+}
+
+// 將圖片相對路徑轉換為 Base64 嵌入
+function embedImages(html, inputFile) {
+    const inputDir = path.dirname(path.resolve(inputFile));
+    const imagesDir = path.resolve(inputDir, '..', 'images');
+
+    return html.replace(
+        /src="\.\.\/images\/([^"]+)"/g,
+        (match, filename) => {
+            const imagePath = path.join(imagesDir, filename);
+
+            // 檢查圖片是否存在
+            if (!fs.existsSync(imagePath)) {
+                console.log(`  ✗ 圖片不存在：${filename}`);
+                return match;
             }
-        );
 
-        // 讀取自訂 CSS 樣式
-        const cssPath = path.join(__dirname, '..', 'pdf-style.css');
-        const css = fs.readFileSync(cssPath, 'utf-8');
+            // 讀取圖片並轉換為 Base64
+            const imageBuffer = fs.readFileSync(imagePath);
+            const base64Image = imageBuffer.toString('base64');
+            const ext = path.extname(filename).toLowerCase();
+            const mimeType = ext === '.png' ? 'image/png' :
+                            ext === '.jpg' || ext === '.jpeg' ? 'image/jpeg' :
+                            ext === '.svg' ? 'image/svg+xml' : 'image/png';
 
-        // 組合完整 HTML
-        const fullHtml = `
+            console.log(`  ✓ 圖片：${filename} (${(imageBuffer.length / 1024).toFixed(1)} KB)`);
+            return `src="data:${mimeType};base64,${base64Image}"`;
+        }
+    );
+}
+
+// 將考卷 Markdown 轉成完整 HTML（LaTeX 轉 SVG、圖片嵌入、套用 pdf-style.css）
+function buildHtml(inputFile) {
+    let markdown = fs.readFileSync(inputFile, 'utf-8');
+    markdown = convertLatexToSvg(markdown);
+    const html = embedImages(md.render(markdown), inputFile);
+
+    // 讀取自訂 CSS 樣式
+    const cssPath = path.join(__dirname, '..', 'pdf-style.css');
+    const css = fs.readFileSync(cssPath, 'utf-8');
+
+    return `
 <!DOCTYPE html>
 <html>
 <head>
@@ -126,67 +150,215 @@ ${html}
 </body>
 </html>
 `;
+}
 
-        // 輸出檔案路徑
-        const outputFile = inputFile.replace('.md', '.pdf');
+function launchBrowser() {
+    return puppeteer.launch({
+        headless: true,
+        args: ['--no-sandbox', '--disable-setuid-sandbox']
+    });
+}
 
-        console.log(`正在生成 PDF：${outputFile}`);
+// 在既有的分頁上輸出 PDF（分頁可重複使用）
+async function renderPdf(page, html, outputFile) {
+    await page.setContent(html, {
+        waitUntil: ['load', 'domcontentloaded', 'networkidle0']
+    });
+    await page.pdf({ ...PDF_OPTIONS, path: outputFile });
+}
 
-        // 啟動 Puppeteer
-        const browser = await puppeteer.launch({
-            headless: true,
-            args: ['--no-sandbox', '--disable-setuid-sandbox']
-        });
+async function convertToPdf(inputFile) {
+    console.log('正在轉換 Markdown 為 HTML...');
+    const html = buildHtml(inputFile);
 
+    // 輸出檔案路徑
+    const outputFile = defaultOutputPath(inputFile);
+    console.log(`正在生成 PDF：${outputFile}`);
+
+    const browser = await launchBrowser();
+    try {
         const page = await browser.newPage();
-        
-        // 載入 HTML 內容
-        await page.setContent(fullHtml, { 
-            waitUntil: ['load', 'domcontentloaded', 'networkidle0']
-        });
+        await renderPdf(page, html, outputFile);
+    } finally {
+        await browser.close();
+    }
 
-        // 生成 PDF
-        await page.pdf({
-            path: outputFile,
-            format: 'A4',
-            margin: {
-                top: '20mm',
-                right: '15mm',
-                bottom: '20mm',
-                left: '15mm'
-            },
-            printBackground: true,
-            displayHeaderFooter: true,
-            headerTemplate: '<div></div>',
-            footerTemplate: `
-                <div style="font-size: 10px; text-align: center; width: 100%; padding: 5px;">
-                    <span class="pageNumber"></span> / <span class="totalPages"></span>
-                </div>
-            `
-        });
+    console.log('✓ PDF 生成成功！');
+    return outputFile;
+}
 
-        await browser.close();
+// 展開命令列輸入：檔案直接使用，目錄取其中的 .md 檔（不含子目錄）
+function collectInputs(inputs) {
+    const files = [];
+    for (const input of inputs) {
+        const stat = fs.statSync(input);
+        if (stat.isDirectory()) {
+            for (const name of fs.readdirSync(input).sort()) {
+                if (name.toLowerCase().endsWith('.md')) {
+                    files.push(path.join(input, name));
+                }
+            }
+        } else {
+            files.push(input);
+        }
+    }
+    return files;
+}
 
-        console.log('✓ PDF 生成成功！');
-        return outputFile;
-    } catch (error) {
-        console.error('錯誤：', error.message);
-        console.error(error.stack);
-        process.exit(1);
+// PDF 比考卷與 pdf-style.css 都新時視為最新，不必重新產生
+function isUpToDate(inputFile, outputFile) {
+    if (!fs.existsSync(outputFile)) {
+        return false;
     }
+    const cssPath = path.join(__dirname, '..', 'pdf-style.css');
+    const sourceTime = Math.max(fs.statSync(inputFile).mtimeMs, fs.statSync(cssPath).mtimeMs);
+    return fs.statSync(outputFile).mtimeMs >= sourceTime;
 }
 
-// 從命令列參數取得輸入檔案
-const inputFile = process.argv[2];
+/**
+ * 批次轉換：共用一個瀏覽器，concurrency 個分頁同時轉換，每個分頁重複使用
+ *
+ * @returns {Promise<Array<{input, output, status, ms, error?}>>} status 為 done / skipped / failed
+ */
+async function convertMany(inputFiles, { concurrency = 4, force = false } = {}) {
+    const results = [];
+    const pending = [];
+    for (const input of inputFiles) {
+        const output = defaultOutputPath(input);
+        if (!force && isUpToDate(input, output)) {
+            results.push({ input, output, status: 'skipped', ms: 0 });
+            console.log(`- ${path.basename(input)}（PDF 已是最新，略過）`);
+        } else {
+            pending.push({ input, output });
+        }
+    }
+    if (pending.length === 0) {
+        return results;
+    }
+
+    const browser = await launchBrowser();
+    let next = 0;
+
+    async function worker() {
+        const page = await browser.newPage();
+        try {
+            while (next < pending.length) {
+                const { input, output } = pending[next++];
+                const started = Date.now();
+                try {
+                    await renderPdf(page, buildHtml(input), output);
+                    const ms = Date.now() - started;
+                    results.push({ input, output, status: 'done', ms });
+                    console.log(`✓ ${path.basename(output)}（${ms} ms）`);
+                } catch (error) {
+                    const ms = Date.now() - started;
+                    results.push({ input, output, status: 'failed', ms, error: error.message });
+                    console.error(`✗ ${path.basename(input)}：${error.message}`);
+                }
+            }
+        } finally {
+            await page.close().catch(() => {});
+        }
+    }
+
+    try {
+        const workers = [];
+        for (let i = 0; i < Math.min(concurrency, pending.length); i++) {
+            workers.push(worker());
+        }
+        await Promise.all(workers);
+    } finally {
+        await browser.close();
+    }
+    return results;
+}
 
-if (!inputFile) {
-    console.error('使用方式: node convert-to-pdf.js <markdown檔案路徑>');
-    process.exit(1);
+function printSummary(results, totalMs) {
+    const done = results.filter((r) => r.status === 'done');
+    const skipped = results.filter((r) => r.status === 'skipped');
+    const failed = results.filter((r) => r.status === 'failed');
+    const renderMs = done.reduce((sum, r) => sum + r.ms, 0);
+
+    console.log('');
+    console.log(`完成 ${done.length} 份、略過 ${skipped.length} 份、失敗 ${failed.length} 份，總耗時 ${(totalMs / 1000).toFixed(1)} 秒`);
+    if (done.length > 0) {
+        const slowest = done.reduce((a, b) => (b.ms > a.ms ? b : a));
+        console.log(`平均每份 ${Math.round(renderMs / done.length)} ms，最慢：${path.basename(slowest.input)}（${slowest.ms} ms）`);
+    }
+    console.log(`公式快取：命中 ${svgCache.hits}、新排版 ${svgCache.misses}`);
+    for (const r of failed) {
+        console.log(`  ✗ ${r.input}：${r.error}`);
+    }
 }
 
-if (!fs.existsSync(inputFile)) {
-    console.error(`檔案不存在: ${inputFile}`);
-    process.exit(1);
+function parseArgs(argv) {
+    const options = { concurrency: 4, force: false };
+    const inputs = [];
+    for (let i = 0; i < argv.length; i++) {
+        const arg = argv[i];
+        if (arg === '--force') {
+            options.force = true;
+        } else if (arg === '--concurrency' || arg === '-j') {
+            options.concurrency = Math.max(1, parseInt(argv[++i], 10) || 1);
+        } else {
+            inputs.push(arg);
+        }
+    }
+    return { inputs, options };
 }
 
-convertToPdf(inputFile);
+module.exports = {
+    texToSvg,
+    typesetSvg,
+    svgCache,
+    convertLatexToSvg,
+    buildHtml,
+    launchBrowser,
+    renderPdf,
+    convertToPdf,
+    convertMany,
+    collectInputs,
+    defaultOutputPath,
+};
+
+if (require.main === module) {
+    // 從命令列參數取得輸入檔案
+    const { inputs, options } = parseArgs(process.argv.slice(2));
+
+    if (inputs.length === 0) {
+        console.error('使用方式: node convert-to-pdf.js <markdown檔案路徑>');
+        console.error('批次轉換: node convert-to-pdf.js <檔案或目錄>... [--force] [--concurrency N]');
+        console.error('  批次模式會略過 PDF 比考卷與 pdf-style.css 都新的檔案，--force 全部重新產生');
+        process.exit(1);
+    }
+
+    for (const input of inputs) {
+        if (!fs.existsSync(input)) {
+            console.error(`檔案不存在: ${input}`);
+            process.exit(1);
+        }
+    }
+
+    if (inputs.length === 1 && fs.statSync(inputs[0]).isFile() && !options.force) {
+        // 單一檔案：維持原本的行為（一律重新產生）
+        convertToPdf(inputs[0]).catch((error) => {
+            console.error('錯誤：', error.message);
+            console.error(error.stack);
+            process.exit(1);
+        });
+    } else {
+        const started = Date.now();
+        convertMany(collectInputs(inputs), options)
+            .then((results) => {
+                printSummary(results, Date.now() - started);
+                if (results.some((r) => r.status === 'failed')) {
+                    process.exit(1);
+                }
+            })
+            .catch((error) => {
+                console.error('錯誤：', error.message);
+                console.error(error.stack);
+                process.exit(1);
+            });
+    }
+}
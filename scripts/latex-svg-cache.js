@@ -0,0 +1,184 @@
+/**
+ * LaTeX → SVG 快取
+ *
+ * 以公式內容（含行內/區塊模式與 MathJax 版本）的 SHA-256 為鍵，
+ * 存成 <快取目錄>/<前兩碼>/<雜湊>.svg，跨執行、跨程序（批次轉換、PDF 服務）共用。
+ * 程序內另有一層小型記憶體 LRU；磁碟總量超過上限時，依最後使用時間刪除最舊的項目。
+ *
+ * 環境變數：
+ *   LATEX_SVG_CACHE_DIR      快取目錄（預設 exams/.cache/latex-svg）
+ *   LATEX_SVG_CACHE_MAX_MB   磁碟上限 MB（預設 50，0 表示停用磁碟快取）
+ */
+
+const crypto = require('crypto');
+const path = require('path');
+const fs = require('fs');
+
+const DEFAULT_DIR = path.join(__dirname, '..', 'exams', '.cache', 'latex-svg');
+
+// 每寫入這麼多筆就檢查一次磁碟用量
+const PRUNE_EVERY_WRITES = 200;
+
+function mathjaxVersion() {
+    try {
+        return require('mathjax-full/package.json').version;
+    } catch (e) {
+        return 'unknown';
+    }
+}
+
+class LatexSvgCache {
+    constructor({
+        dir = process.env.LATEX_SVG_CACHE_DIR || DEFAULT_DIR,
+        maxBytes = parseFloat(process.env.LATEX_SVG_CACHE_MAX_MB || '50') * 1024 * 1024,
+        memoryEntries = 2000,
+    } = {}) {
+        this.dir = dir;
+        this.maxBytes = maxBytes;
+        this.memoryEntries = memoryEntries;
+        this.memory = new Map();
+        this.version = mathjaxVersion();
+        this.writesSincePrune = 0;
+        this.hits = 0;
+        this.misses = 0;
+    }
+
+    key(tex, display) {
+        return crypto
+            .createHash('sha256')
+            .update(`${this.version}\0${display ? 'display' : 'inline'}\0${tex}`)
+            .digest('hex');
+    }
+
+    filePath(key) {
+        return path.join(this.dir, key.slice(0, 2), `${key}.svg`);
+    }
+
+    remember(key, svg) {
+        // Map 保留插入順序：刪掉再插入即移到最新，超過上限時淘汰最舊的
+        this.memory.delete(key);
+        this.memory.set(key, svg);
+        if (this.memory.size > this.memoryEntries) {
+            this.memory.delete(this.memory.keys().next().value);
+        }
+    }
+
+    get(tex, display) {
+        const key = this.key(tex, display);
+        const cached = this.memory.get(key);
+        if (cached !== undefined) {
+            this.remember(key, cached);
+            this.hits++;
+            return cached;
+        }
+        if (this.maxBytes > 0) {
+            const file = this.filePath(key);
+            try {
+                const svg = fs.readFileSync(file, 'utf-8');
+                // 更新 mtime 作為最後使用時間（淘汰時依此排序）
+                const now = new Date();
+                fs.utimesSync(file, now, now);
+                this.remember(key, svg);
+                this.hits++;
+                return svg;
+            } catch (e) {
+                // 沒有快取
+            }
+        }
+        this.misses++;
+        return undefined;
+    }
+
+    set(tex, display, svg) {
+        const key = this.key(tex, display);
+        this.remember(key, svg);
+        if (this.maxBytes <= 0) {
+            return;
+        }
+        const file = this.filePath(key);
+        try {
+            fs.mkdirSync(path.dirname(file), { recursive: true });
+            // 先寫暫存檔再改名，其他程序不會讀到寫到一半的內容
+            const tmp = `${file}.${process.pid}.tmp`;
+            fs.writeFileSync(tmp, svg);
+            fs.renameSync(tmp, file);
+        } catch (e) {
+            console.error(`公式快取寫入失敗: ${e.message}`);
+            return;
+        }
+        if (++this.writesSincePrune >= PRUNE_EVERY_WRITES) {
+            this.prune();
+        }
+    }
+
+    /**
+     * 磁碟用量超過上限時，刪除最久沒用到的項目，降到上限的 90%
+     */
+    prune() {
+        this.writesSincePrune = 0;
+        const entries = [];
+        let total = 0;
+        let subdirs;
+        try {
+            subdirs = fs.readdirSync(this.dir);
+        } catch (e) {
+            return;
+        }
+        for (const sub of subdirs) {
+            const subdir = path.join(this.dir, sub);
+            let names;
+            try {
+                names = fs.readdirSync(subdir);
+            } catch (e) {
+                continue;
+            }
+            for (const name of names) {
+                if (!name.endsWith('.svg')) {
+                    continue;
+                }
+                const file = path.join(subdir, name);
+                try {
+                    const stat = fs.statSync(file);
+                    entries.push({ file, size: stat.size, mtime: stat.mtimeMs });
+                    total += stat.size;
+                } catch (e) {
+                    // 已被其他程序刪除
+                }
+            }
+        }
+        if (total <= this.maxBytes) {
+            return;
+        }
+        entries.sort((a, b) => a.mtime - b.mtime);
+        const target = this.maxBytes * 0.9;
+        for (const entry of entries) {
+            if (total <= target) {
+                break;
+            }
+            try {
+                fs.unlinkSync(entry.file);
+            } catch (e) {
+                // 已被其他程序刪除
+            }
+            total -= entry.size;
+        }
+    }
+
+    /**
+     * 包裝 texToSvg(tex, inline)：命中快取時不呼叫 MathJax，轉換失敗的公式不快取
+     */
+    wrap(texToSvg) {
+        return (tex, inline = true) => {
+            const display = !inline;
+            const cached = this.get(tex, display);
+            if (cached !== undefined) {
+                return cached;
+            }
+            const svg = texToSvg(tex, inline);
+            this.set(tex, display, svg);
+            return svg;
+        };
+    }
+}
+
+module.exports = { LatexSvgCache };
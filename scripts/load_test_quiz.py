@@ -0,0 +1,146 @@
+"""
+交卷負載測試
+
+對執行中的後端同時送出大量交卷，統計延遲分佈（p50/p95/p99）與吞吐量。
+每次交卷都和學生一樣先開卷（GET /api/quiz/{exam_id}，建立作答階段）再帶 session_id 送出
+POST /api/quiz/submit；開卷與交卷的延遲分開統計。
+用來比較 event loop 上有無阻塞 I/O 時，併發交卷的尾端延遲。
+
+使用方式（後端需已啟動）：
+    python scripts/load_test_quiz.py
+    python scripts/load_test_quiz.py --concurrency 100 --requests 5000
+    python scripts/load_test_quiz.py --rate 150 --requests 3000   # 固定速率，比較尾端延遲
+    python scripts/load_test_quiz.py --exam-id exam-math-01kdwq8z3m5p7r9t2v4x6y8zab --base-url http://localhost:8000
+
+沒有指定 --exam-id 時，從 /api/exams 取最新的 --max-exams 份考卷輪流交卷；
+搭配較小的 EXAM_CACHE_SIZE 啟動後端，可以讓每次交卷都需要讀檔解析。
+預設以 --concurrency 個連線連續送出，量的是飽和時的吞吐量；尾端延遲會被排隊主導，
+加上 --rate 改為依固定速率送出（延遲從排定的送出時間起算），比較 event loop 被阻塞造成的尾端延遲。
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from typing import Dict, List
+
+import httpx
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近排名法的百分位數（sorted_values 需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def load_question_ids(client: httpx.AsyncClient, exam_ids: List[str]) -> Dict[str, List[int]]:
+    """取得每份考卷的題號（交卷時作答用）"""
+    questions = {}
+    for exam_id in exam_ids:
+        resp = await client.get(f"/api/quiz/{exam_id}")
+        if resp.status_code != 200:
+            print(f"  ✗ 略過 {exam_id}：{resp.status_code}")
+            continue
+        questions[exam_id] = [q["id"] for q in resp.json()["questions"]]
+    return questions
+
+
+async def run(args: argparse.Namespace) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0, limits=limits) as client:
+        exam_ids = args.exam_id
+        if not exam_ids:
+            resp = await client.get("/api/exams", params={"limit": args.max_exams})
+            resp.raise_for_status()
+            exam_ids = [e["exam_id"] for e in resp.json()["exams"]]
+        questions = await load_question_ids(client, exam_ids)
+        if not questions:
+            print("沒有可用的考卷，請先出題或以 --exam-id 指定")
+            return 1
+
+        mode = f"固定速率 {args.rate:g} req/s（最多同時 {args.concurrency}）" if args.rate else f"併發 {args.concurrency}"
+        print(f"考卷 {len(questions)} 份，{mode}，共 {args.requests} 次交卷")
+        rng = random.Random(args.seed)
+        targets = [rng.choice(list(questions)) for _ in range(args.requests)]
+        open_latencies: List[float] = []
+        latencies: List[float] = []
+        errors = 0
+
+        async def submit(exam_id: str, started: float) -> None:
+            """開卷後交卷一次；開卷延遲從 started 起算，交卷延遲從送出交卷起算"""
+            nonlocal errors
+            payload = {
+                "exam_id": exam_id,
+                "answers": [
+                    {"question_id": q_id, "user_answer": rng.choice("ABCD")}
+                    for q_id in questions[exam_id]
+                ],
+            }
+            try:
+                opened = await client.get(f"/api/quiz/{exam_id}")
+                open_latencies.append((time.perf_counter() - started) * 1000)
+                payload["session_id"] = opened.json().get("session_id")
+                submitted = time.perf_counter()
+                resp = await client.post("/api/quiz/submit", json=payload)
+                latencies.append((time.perf_counter() - submitted) * 1000)
+                ok = resp.status_code == 200
+            except (httpx.HTTPError, ValueError):
+                ok = False
+            if not ok:
+                errors += 1
+
+        next_index = 0
+
+        async def worker() -> None:
+            nonlocal next_index
+            while next_index < len(targets):
+                exam_id = targets[next_index]
+                next_index += 1
+                await submit(exam_id, time.perf_counter())
+
+        async def scheduled(index: int, exam_id: str, semaphore: asyncio.Semaphore) -> None:
+            # 延遲從排定的送出時間起算：後端卡住時排隊等待的時間也算在內
+            at = started + index / args.rate
+            await asyncio.sleep(max(0.0, at - time.perf_counter()))
+            async with semaphore:
+                await submit(exam_id, at)
+
+        started = time.perf_counter()
+        if args.rate:
+            semaphore = asyncio.Semaphore(args.concurrency)
+            await asyncio.gather(*(scheduled(i, e, semaphore) for i, e in enumerate(targets)))
+        else:
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"完成 {len(latencies)} 次交卷（失敗 {errors}），耗時 {elapsed:.2f} 秒，{len(latencies) / elapsed:.0f} 次/秒")
+    for name, values in (("開卷", open_latencies), ("交卷", latencies)):
+        if not values:
+            continue
+        values.sort()
+        print(
+            f"{name}延遲 ms：平均 {statistics.mean(values):.1f}、p50 {percentile(values, 50):.1f}、"
+            f"p95 {percentile(values, 95):.1f}、p99 {percentile(values, 99):.1f}、最大 {values[-1]:.1f}"
+        )
+    return 1 if errors else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="交卷負載測試")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--exam-id", action="append", help="指定考卷（可重複）；未指定時取最新的考卷")
+    parser.add_argument("--max-exams", type=int, default=20, help="未指定考卷時使用的份數")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0, help="固定每秒送出的交卷數（開放式負載）；0 表示 concurrency 個連線連續送出")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,807 @@
+"""
+Parallel, resumable OCR pipeline for exam PDFs.
+
+Pages from all input PDFs are spread over a process pool; every worker
+process owns a single RapidOCR engine. Pages that already carry a real
+text layer are read with PyMuPDF instead of OCR, and only the images on
+them that the text layer does not cover are rasterized and recognized;
+scanned pages are OCR'd whole. Raw OCR results are cached by the hash of
+the rendered pixels, zoom, strategy and engine version, so reruns, changed
+PDFs and newly added strategies only pay for pages whose pixels are new.
+Each finished page is checkpointed
+right away to <output>/.pages/<pdf name>/p0001.json, so an interrupted run
+resumes at the first missing page instead of starting the document over.
+Once all pages of a PDF are done, one text file per strategy is assembled
+from the checkpoints; with --fuse the strategies are also merged line by
+line into <pdf name>_merged.json, keeping the highest-confidence reading.
+
+Usage:
+    python scripts/ocr_pipeline.py                       # every PDF in exams/bank
+    python scripts/ocr_pipeline.py a.pdf b.pdf --workers 4
+    python scripts/ocr_pipeline.py exams/bank --strategies original,binary --zoom 3
+    python scripts/ocr_pipeline.py scans --strategies binary,denoise,deskew   # noisy or tilted scans
+    python scripts/ocr_pipeline.py exams/bank --strategies original,binary --fuse   # + merged JSON
+    python scripts/ocr_pipeline.py exams/bank --force     # ignore checkpoints
+    python scripts/ocr_pipeline.py exams/bank --no-text-layer   # OCR every page
+    python scripts/ocr_pipeline.py exams/bank --no-cache        # do not read or write the OCR cache
+
+ocr_pdf_rapid.py and ocr_pdf_multi.py are thin wrappers around this module.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import stat
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+BANK_DIR = os.path.join(os.path.dirname(__file__), '../exams/bank')
+DEFAULT_OUTPUT_DIR = os.path.join(BANK_DIR, 'extracted_ocr')
+DEFAULT_CACHE_DIR = os.environ.get(
+    'OCR_CACHE_DIR', os.path.join(os.path.dirname(__file__), '../exams/.cache/ocr')
+)
+
+STRATEGIES = ('original', 'binary', 'denoise', 'deskew')
+NO_TEXT = '(No text found)'
+
+# Bump when the page checkpoint layout changes, so old checkpoints are redone
+CHECKPOINT_VERSION = 2
+
+# A text layer counts as real when it has this many visible characters and
+# few undecodable ones (broken font encodings extract as U+FFFD / private use)
+MIN_TEXT_CHARS = 20
+MAX_BAD_CHAR_RATIO = 0.1
+# Images smaller than this fraction of the page are not worth OCR
+MIN_IMAGE_AREA = 0.02
+
+# Bump a strategy's version when its preprocessing changes, so its cached OCR is not reused
+STRATEGY_VERSIONS = {'original': 1, 'binary': 1, 'denoise': 1, 'deskew': 1}
+
+# Fusion: lines of different strategies are the same line when their boxes overlap
+# this much (intersection over union), or when the smaller box lies this far inside
+# the larger one (one strategy split the line into fragments)
+FUSE_MIN_IOU = 0.5
+FUSE_FRAGMENT_COVER = 0.8
+
+# Deskew only corrects small scan rotations; larger estimates are treated as noise
+MAX_DESKEW_DEGREES = 10.0
+MIN_DESKEW_DEGREES = 0.1
+
+
+def engine_version() -> str:
+    """RapidOCR package version (read from metadata, without loading the models)."""
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return f"rapidocr_onnxruntime-{version('rapidocr_onnxruntime')}"
+    except PackageNotFoundError:
+        return "rapidocr_onnxruntime-unknown"
+
+
+class OcrCache:
+    """
+    Content-addressed cache of raw RapidOCR results
+
+    Key: sha256 of (rendered pixel hash, zoom, strategy + its version, engine version).
+    Value: the raw boxes (pixels of the rendered image), text and scores, stored as
+    <dir>/<first two hex>/<key>.json. Several worker processes (and runs) share it;
+    entries are written to a temp file and renamed, so readers never see partial JSON.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.dir = cache_dir
+        self.engine = engine_version()
+
+    def key(self, pixel_hash: str, zoom: float, strategy: str) -> str:
+        raw = f"{pixel_hash}\0{zoom}\0{strategy}-{STRATEGY_VERSIONS[strategy]}\0{self.engine}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[list]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, raw: list) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, json.dumps(raw, ensure_ascii=False))
+        except OSError as e:
+            print(f"  -> OCR cache write failed: {e}")
+
+
+def pixel_hash(pix: fitz.Pixmap) -> str:
+    """Hash of the rendered pixels (size, channels and the raw sample buffer)."""
+    digest = hashlib.sha256(f"{pix.width}x{pix.height}x{pix.n}".encode())
+    digest.update(pix.samples_mv)
+    return digest.hexdigest()
+
+
+# ==================== Worker process ====================
+
+_engine = None
+_engine_threads = 1
+_cache: Optional[OcrCache] = None
+_cache_stats = {'hits': 0, 'misses': 0}
+_docs: "OrderedDict[str, fitz.Document]" = OrderedDict()
+MAX_OPEN_DOCS = 4
+
+
+def _init_worker(threads: int, cache_dir: Optional[str]) -> None:
+    """Runs once per worker process."""
+    global _engine_threads, _cache
+    _engine_threads = threads
+    _cache = OcrCache(cache_dir) if cache_dir else None
+
+
+def _get_engine():
+    """Load the OCR models on first use (workers that only see text pages never do)."""
+    global _engine
+    if _engine is None:
+        from rapidocr_onnxruntime import RapidOCR
+        _engine = RapidOCR(intra_op_num_threads=_engine_threads, inter_op_num_threads=1)
+    return _engine
+
+
+def _open_doc(pdf_path: str) -> fitz.Document:
+    """Keep the last few PDFs open in the worker; pages arrive in document order."""
+    doc = _docs.pop(pdf_path, None)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+    _docs[pdf_path] = doc
+    while len(_docs) > MAX_OPEN_DOCS:
+        _docs.popitem(last=False)[1].close()
+    return doc
+
+
+def pixmap_array(pix: fitz.Pixmap) -> np.ndarray:
+    """
+    HxWxN uint8 view of the pixmap's sample buffer (no copy).
+    Only valid while pix is alive, so keep the pixmap referenced while the view is used.
+    """
+    return np.ndarray(
+        shape=(pix.height, pix.width, pix.n),
+        dtype=np.uint8,
+        buffer=pix.samples_mv,
+        strides=(pix.stride, pix.n, 1),
+    )
+
+
+def _otsu(gray: np.ndarray) -> np.ndarray:
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def _deskew(gray: np.ndarray, binary: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Rotate the page so text lines are horizontal. The angle comes from the minimum-area
+    rectangle around the dark (ink) pixels. Returns (image, inverse affine) where the
+    inverse maps points of the rotated image back to the rendered page, or None when
+    no rotation was applied.
+    """
+    ink = cv2.findNonZero(255 - binary)
+    if ink is None:
+        return gray, None
+    # The rectangle angle convention differs between OpenCV versions ([0, 90) or [-90, 0));
+    # either way the text rotation is the angle nearest to 0 modulo 90
+    angle = (cv2.minAreaRect(ink)[2] + 45) % 90 - 45
+    if not MIN_DESKEW_DEGREES <= abs(angle) <= MAX_DESKEW_DEGREES:
+        return gray, None
+    h, w = gray.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    rotated = cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+    return rotated, cv2.invertAffineTransform(matrix)
+
+
+def preprocess_image(
+    pix: fitz.Pixmap, strategies: Sequence[str]
+) -> Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]]:
+    """
+    Build the OCR input of every requested strategy straight from the pixmap buffer
+
+    Returns {strategy: (ndarray, inverse affine or None)}. Intermediate stages (gray,
+    Otsu binary) are computed once and shared between strategies:
+      original  the rendered page (BGR, as RapidOCR expects)
+      binary    grayscale + Otsu threshold, good for high contrast text
+      denoise   3x3 median blur before Otsu, for speckled scans
+      deskew    grayscale rotated so text lines are horizontal
+    """
+    rgb = pixmap_array(pix)
+    stages: Dict[str, np.ndarray] = {}
+
+    def gray() -> np.ndarray:
+        if 'gray' not in stages:
+            stages['gray'] = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        return stages['gray']
+
+    def binary() -> np.ndarray:
+        if 'binary' not in stages:
+            stages['binary'] = _otsu(gray())
+        return stages['binary']
+
+    processed = {}
+    for strategy in strategies:
+        if strategy == 'original':
+            processed[strategy] = (cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), None)
+        elif strategy == 'binary':
+            processed[strategy] = (binary(), None)
+        elif strategy == 'denoise':
+            processed[strategy] = (_otsu(cv2.medianBlur(gray(), 3)), None)
+        elif strategy == 'deskew':
+            processed[strategy] = _deskew(gray(), binary())
+    return processed
+
+
+def _run_ocr(image: np.ndarray, inverse: Optional[np.ndarray] = None) -> list:
+    """
+    Run RapidOCR on an ndarray; returns raw [[box in pixels, text, score], ...] as plain
+    JSON-able values. inverse (2x3 affine) maps boxes of a transformed image back to the page.
+    """
+    result, _ = _get_engine()(image)
+    raw = []
+    for box, text, score in (result or []):
+        points = np.asarray(box, dtype=np.float64)
+        if inverse is not None:
+            points = points @ inverse[:, :2].T + inverse[:, 2]
+        raw.append([np.round(points, 1).tolist(), text, round(float(score), 4)])
+    return raw
+
+
+def _to_lines(raw: list, zoom: float, origin: Tuple[float, float]) -> List[dict]:
+    """Raw OCR boxes (pixels of the rendered clip) to lines with boxes in PDF points."""
+    ox, oy = origin
+    return [
+        {
+            'box': [[round(ox + x / zoom, 1), round(oy + y / zoom, 1)] for x, y in box],
+            'text': text,
+            'score': score,
+        }
+        for box, text, score in raw
+    ]
+
+
+def _ocr_region(page: fitz.Page, zoom: float, strategies: Sequence[str], clip=None) -> Dict[str, List[dict]]:
+    """
+    Rasterize the page (or a clip of it) and OCR it with every strategy.
+    Strategies whose result is cached for these exact pixels skip preprocessing and OCR.
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+    origin = (clip.x0, clip.y0) if clip is not None else (0.0, 0.0)
+
+    raw_results: Dict[str, list] = {}
+    keys: Dict[str, str] = {}
+    if _cache is not None:
+        pixels = pixel_hash(pix)
+        for strategy in strategies:
+            keys[strategy] = _cache.key(pixels, zoom, strategy)
+            cached = _cache.get(keys[strategy])
+            if cached is not None:
+                raw_results[strategy] = cached
+                _cache_stats['hits'] += 1
+    missing = [s for s in strategies if s not in raw_results]
+    if missing:
+        for strategy, (img, inverse) in preprocess_image(pix, missing).items():
+            raw_results[strategy] = _run_ocr(img, inverse)
+            if _cache is not None:
+                _cache_stats['misses'] += 1
+                _cache.set(keys[strategy], raw_results[strategy])
+    return {strategy: _to_lines(raw_results[strategy], zoom, origin) for strategy in strategies}
+
+
+def _text_layer_lines(page: fitz.Page) -> List[dict]:
+    """Lines of the embedded text layer, in the same shape as OCR lines (score 1.0)."""
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = line["bbox"]
+            lines.append({
+                'box': [[round(x0, 1), round(y0, 1)], [round(x1, 1), round(y0, 1)],
+                        [round(x1, 1), round(y1, 1)], [round(x0, 1), round(y1, 1)]],
+                'text': text,
+                'score': 1.0,
+            })
+    return lines
+
+
+def _is_real_text(lines: List[dict]) -> bool:
+    chars = [c for line in lines for c in line['text'] if not c.isspace()]
+    if len(chars) < MIN_TEXT_CHARS:
+        return False
+    bad = sum(1 for c in chars if c == '\ufffd' or '\ue000' <= c <= '\uf8ff')
+    return bad / len(chars) <= MAX_BAD_CHAR_RATIO
+
+
+def _uncovered_images(page: fitz.Page, lines: List[dict]) -> List[fitz.Rect]:
+    """
+    Image areas worth OCR: large enough, and not already covered by the text layer
+    (scans that carry an invisible OCR layer have text on top of the image).
+    """
+    min_area = abs(page.rect) * MIN_IMAGE_AREA
+    regions = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or abs(rect) < min_area:
+            continue
+        covered = sum(
+            len(line['text']) for line in lines
+            if rect.contains(fitz.Rect(line['box'][0] + line['box'][2]))
+        )
+        if covered < MIN_TEXT_CHARS:
+            regions.append(rect)
+    return regions
+
+
+def _reading_order(line: dict) -> Tuple[float, float]:
+    (x0, y0), (_, _), (_, y1), _ = line['box']
+    return (round((y0 + y1) / 2 / 5), x0)
+
+
+def _join_texts(texts: List[str]) -> str:
+    """Join fragments of one line; a space only between Latin letters/digits (not CJK)."""
+    out = texts[0]
+    for text in texts[1:]:
+        if out and text and out[-1].isascii() and out[-1].isalnum() and text[0].isascii() and text[0].isalnum():
+            out += ' '
+        out += text
+    return out
+
+
+def fuse_lines(per_strategy: Dict[str, List[dict]]) -> List[dict]:
+    """
+    Merge one page's lines from several strategies into a single reading
+
+    Lines of different strategies are aligned when their boxes overlap (IoU) or one lies
+    inside the other, so a line one strategy split into fragments lines up with the whole
+    line another strategy read. Per aligned line, each strategy's fragments are joined in
+    x order with a length-weighted score, and the highest-confidence reading is kept; all
+    readings are listed under 'readings' so disagreements stay visible.
+    """
+    items = [(s, i, line) for s, lines in per_strategy.items() for i, line in enumerate(lines)]
+    if not items:
+        return []
+    strategy_ids = np.array([list(per_strategy).index(s) for s, _, _ in items])
+    rects = np.array([
+        [min(x for x, _ in line['box']), min(y for _, y in line['box']),
+         max(x for x, _ in line['box']), max(y for _, y in line['box'])]
+        for _, _, line in items
+    ])
+
+    # Pairwise overlap of all boxes on the page at once
+    x0, y0, x1, y1 = (rects[:, k] for k in range(4))
+    area = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    inter = (
+        np.clip(np.minimum(x1[:, None], x1) - np.maximum(x0[:, None], x0), 0, None)
+        * np.clip(np.minimum(y1[:, None], y1) - np.maximum(y0[:, None], y0), 0, None)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = np.nan_to_num(inter / (area[:, None] + area - inter))
+        cover = np.nan_to_num(inter / np.minimum(area[:, None], area))
+    linked = (iou >= FUSE_MIN_IOU) | (cover >= FUSE_FRAGMENT_COVER)
+    # Lines of the same strategy are only ever aligned through another strategy
+    linked &= strategy_ids[:, None] != strategy_ids
+
+    # Connected components (union-find) of the alignment graph
+    parent = list(range(len(items)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in zip(*np.nonzero(np.triu(linked, 1))):
+        parent[find(a)] = find(b)
+    clusters: Dict[int, List[int]] = OrderedDict()
+    for i in range(len(items)):
+        clusters.setdefault(find(i), []).append(i)
+
+    first = next(iter(per_strategy))
+    fused = []
+    for members in clusters.values():
+        readings = []
+        for strategy in per_strategy:
+            parts = sorted((i for i in members if items[i][0] == strategy), key=lambda i: rects[i][0])
+            if not parts:
+                continue
+            lines = [items[i][2] for i in parts]
+            weights = [max(1, len(line['text'])) for line in lines]
+            score = sum(w * line['score'] for w, line in zip(weights, lines)) / sum(weights)
+            if len(lines) == 1:
+                box = lines[0]['box']
+            else:
+                bx0, by0 = rects[parts].min(axis=0)[:2]
+                bx1, by1 = rects[parts].max(axis=0)[2:]
+                box = [[round(float(x), 1), round(float(y), 1)] for x, y in ((bx0, by0), (bx1, by0), (bx1, by1), (bx0, by1))]
+            readings.append({
+                'strategy': strategy,
+                'text': _join_texts([line['text'] for line in lines]),
+                'score': round(score, 4),
+                'box': box,
+                # Position in the first strategy's line order, to keep that order when possible
+                'order': items[parts[0]][1] if strategy == first else None,
+            })
+        best = max(readings, key=lambda r: r['score'])
+        fused.append({
+            'box': best['box'],
+            'text': best['text'],
+            'score': best['score'],
+            'strategy': best['strategy'],
+            'readings': [{'strategy': r['strategy'], 'text': r['text'], 'score': r['score']} for r in readings],
+            'order': readings[0]['order'],
+        })
+
+    if all(line['order'] is not None for line in fused):
+        fused.sort(key=lambda line: line['order'])
+    else:
+        fused.sort(key=_reading_order)
+    for line in fused:
+        del line['order']
+    return fused
+
+
+def ocr_page(
+    pdf_path: str,
+    page_index: int,
+    zoom: float,
+    strategies: Sequence[str],
+    use_text_layer: bool = True,
+) -> dict:
+    """
+    Extract one page (runs in a worker process)
+
+    source is "text" (text layer only), "text+ocr" (text layer plus OCR of uncovered
+    images) or "ocr" (whole page rasterized). Boxes are in PDF points.
+    """
+    started = time.perf_counter()
+    hits, misses = _cache_stats['hits'], _cache_stats['misses']
+    page = _open_doc(pdf_path)[page_index]
+    text_lines = _text_layer_lines(page) if use_text_layer else []
+
+    if use_text_layer and _is_real_text(text_lines):
+        regions = _uncovered_images(page, text_lines)
+        per_strategy = {strategy: list(text_lines) for strategy in strategies}
+        for rect in regions:
+            for strategy, lines in _ocr_region(page, zoom, strategies, clip=rect).items():
+                per_strategy[strategy].extend(lines)
+        if regions:
+            # Slot OCR'd image text between the text-layer lines by position
+            for lines in per_strategy.values():
+                lines.sort(key=_reading_order)
+        source = 'text+ocr' if regions else 'text'
+    else:
+        per_strategy = _ocr_region(page, zoom, strategies)
+        source = 'ocr'
+
+    return {
+        'page': page_index + 1,
+        'source': source,
+        'strategies': {strategy: {'lines': lines} for strategy, lines in per_strategy.items()},
+        'cache': {'hits': _cache_stats['hits'] - hits, 'misses': _cache_stats['misses'] - misses},
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+# ==================== Main process ====================
+
+# The umask can only be read by setting it, so read it once at import.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _atomic_write(path: str, text: str) -> None:
+    """Write to a temp file next to the target, then rename over it.
+
+    mkstemp creates the temp file as 0600; it gets the target's existing mode
+    (or 0666 minus the umask, like a plain open()) before the rename.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.fchmod(f.fileno(), mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def default_text_name(base: str, strategy: str) -> str:
+    return f"{base}_{strategy}.txt"
+
+
+def default_merged_name(base: str) -> str:
+    return f"{base}_merged.json"
+
+
+class DocumentJob:
+    """Progress of one PDF: which pages still need OCR, where results go."""
+
+    def __init__(self, pipeline: "OcrPipeline", pdf_path: str):
+        self.pdf_path = pdf_path
+        self.base = os.path.splitext(os.path.basename(pdf_path))[0]
+        self.pages_dir = os.path.join(pipeline.output_dir, '.pages', self.base)
+        with fitz.open(pdf_path) as doc:
+            self.page_count = len(doc)
+        stat = os.stat(pdf_path)
+        # Checkpoints from a different version of the PDF are redone (the OCR cache
+        # still answers for every page whose rendered pixels did not change)
+        self.fingerprint = [stat.st_size, stat.st_mtime_ns]
+        self.pending: List[int] = []
+        self.failed: List[int] = []
+
+    def checkpoint_path(self, page_index: int) -> str:
+        return os.path.join(self.pages_dir, f"p{page_index + 1:04d}.json")
+
+
+class OcrPipeline:
+    """
+    Page-parallel OCR over a process pool with per-page checkpoints
+
+    - zoom: render scale (2 = 144 dpi)
+    - strategies: preprocessing variants OCR'd per page (see STRATEGIES)
+    - workers: OCR processes, each holding one RapidOCR engine
+    - threads: onnxruntime threads per worker (1 keeps workers from oversubscribing cores)
+    - use_text_layer: read pages that have a real text layer instead of OCR'ing them
+    - cache_dir: shared OCR result cache (None disables it)
+    - text_name(base, strategy): output text file name for each strategy
+    - page_header: header line written before each page's text
+    - fuse: also write merged_name(base), one JSON with the best reading of every line
+      across strategies (see fuse_lines)
+    """
+
+    def __init__(
+        self,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        zoom: float = 2.0,
+        strategies: Sequence[str] = ('original',),
+        workers: Optional[int] = None,
+        threads: int = 1,
+        use_text_layer: bool = True,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        text_name: Callable[[str, str], str] = default_text_name,
+        page_header: str = "--- Page {page} ---",
+        fuse: bool = False,
+        merged_name: Callable[[str], str] = default_merged_name,
+    ):
+        unknown = set(strategies) - set(STRATEGIES)
+        if unknown:
+            raise ValueError(f"Unknown strategies: {', '.join(sorted(unknown))}")
+        self.output_dir = output_dir
+        self.zoom = zoom
+        self.strategies = tuple(strategies)
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.use_text_layer = use_text_layer
+        self.cache_dir = cache_dir
+        self.text_name = text_name
+        self.page_header = page_header
+        self.fuse = fuse
+        self.merged_name = merged_name
+
+    def _settings(self) -> dict:
+        return {
+            'version': CHECKPOINT_VERSION,
+            'zoom': self.zoom,
+            'strategies': list(self.strategies),
+            'text_layer': self.use_text_layer,
+        }
+
+    def _load_checkpoint(self, job: DocumentJob, page_index: int) -> Optional[dict]:
+        """A page checkpoint counts only if it was made with the current settings."""
+        try:
+            with open(job.checkpoint_path(page_index), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('settings') != self._settings() or data.get('pdf') != job.fingerprint:
+            return None
+        return data
+
+    def _save_checkpoint(self, job: DocumentJob, page_index: int, result: dict) -> None:
+        os.makedirs(job.pages_dir, exist_ok=True)
+        result['settings'] = self._settings()
+        result['pdf'] = job.fingerprint
+        _atomic_write(job.checkpoint_path(page_index), json.dumps(result, ensure_ascii=False))
+
+    def _text_paths(self, job: DocumentJob) -> Dict[str, str]:
+        return {s: os.path.join(self.output_dir, self.text_name(job.base, s)) for s in self.strategies}
+
+    def _output_paths(self, job: DocumentJob) -> List[str]:
+        paths = list(self._text_paths(job).values())
+        if self.fuse:
+            paths.append(os.path.join(self.output_dir, self.merged_name(job.base)))
+        return paths
+
+    def _assemble(self, job: DocumentJob) -> None:
+        """Join the page checkpoints into one text file per strategy (and the merged JSON)."""
+        pages = [self._load_checkpoint(job, i) for i in range(job.page_count)]
+        for strategy, path in self._text_paths(job).items():
+            chunks = []
+            for page in pages:
+                lines = page['strategies'][strategy]['lines']
+                text = "\n".join(line['text'] for line in lines) or NO_TEXT
+                header = self.page_header.format(page=page['page'], strategy=strategy)
+                chunks.append(f"{header}\n{text}")
+            _atomic_write(path, "\n\n".join(chunks))
+            print(f"    Saved: {os.path.basename(path)}")
+        if self.fuse:
+            self._write_merged(job, pages)
+
+    def _write_merged(self, job: DocumentJob, pages: List[dict]) -> None:
+        merged_pages = []
+        replaced = 0
+        for page in pages:
+            lines = fuse_lines({s: page['strategies'][s]['lines'] for s in self.strategies})
+            replaced += sum(1 for line in lines if line['strategy'] != self.strategies[0])
+            merged_pages.append({
+                'page': page['page'],
+                'source': page['source'],
+                'text': "\n".join(line['text'] for line in lines),
+                'lines': lines,
+            })
+        merged = {
+            'pdf': os.path.basename(job.pdf_path),
+            'zoom': self.zoom,
+            'strategies': list(self.strategies),
+            'pages': merged_pages,
+        }
+        path = os.path.join(self.output_dir, self.merged_name(job.base))
+        _atomic_write(path, json.dumps(merged, ensure_ascii=False, indent=1))
+        total = sum(len(page['lines']) for page in merged_pages)
+        print(f"    Saved: {os.path.basename(path)} ({total} lines, {replaced} not from {self.strategies[0]})")
+
+    def _plan(self, pdf_paths: Sequence[str], force: bool) -> List[DocumentJob]:
+        jobs = []
+        for pdf_path in pdf_paths:
+            try:
+                job = DocumentJob(self, pdf_path)
+            except Exception as e:
+                print(f"  -> Error opening {os.path.basename(pdf_path)}: {e}")
+                continue
+            outputs_exist = all(os.path.exists(p) for p in self._output_paths(job))
+            if not force and outputs_exist and not os.path.isdir(job.pages_dir):
+                # Finished by an older run that did not keep checkpoints
+                print(f"Skipping {os.path.basename(pdf_path)} (already processed)")
+                continue
+            job.pending = [
+                i for i in range(job.page_count)
+                if force or self._load_checkpoint(job, i) is None
+            ]
+            if not job.pending and outputs_exist:
+                print(f"Skipping {os.path.basename(pdf_path)} (already processed)")
+                continue
+            resumed = job.page_count - len(job.pending)
+            note = f", resuming after {resumed} checkpointed pages" if resumed else ""
+            print(f"Queued {os.path.basename(pdf_path)}: {len(job.pending)}/{job.page_count} pages{note}")
+            jobs.append(job)
+        return jobs
+
+    def run(self, pdf_paths: Sequence[str], force: bool = False) -> dict:
+        """OCR the given PDFs; returns counts of pages done and failed."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        jobs = self._plan(pdf_paths, force)
+        total = sum(len(job.pending) for job in jobs)
+        remaining = {id(job): len(job.pending) for job in jobs}
+        done = 0
+        sources = {'text': 0, 'text+ocr': 0, 'ocr': 0}
+        cache = {'hits': 0, 'misses': 0}
+        started = time.perf_counter()
+
+        # Documents whose pages were all checkpointed earlier only need assembling
+        for job in jobs:
+            if not job.pending:
+                self._assemble(job)
+
+        if total:
+            print(f"Extracting {total} pages with {self.workers} workers (zoom {self.zoom}, {', '.join(self.strategies)})")
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.threads, self.cache_dir),
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        ocr_page, job.pdf_path, i, self.zoom, self.strategies, self.use_text_layer
+                    ): (job, i)
+                    for job in jobs for i in job.pending
+                }
+                for future in as_completed(futures):
+                    job, page_index = futures[future]
+                    try:
+                        result = future.result()
+                        self._save_checkpoint(job, page_index, result)
+                        sources[result['source']] += 1
+                        for k in cache:
+                            cache[k] += result['cache'][k]
+                        done += 1
+                        print(f"  -> {job.base} page {page_index + 1}/{job.page_count} ({done}/{total})")
+                    except Exception as e:
+                        job.failed.append(page_index + 1)
+                        print(f"  -> Error on {job.base} page {page_index + 1}: {e}")
+                    remaining[id(job)] -= 1
+                    if remaining[id(job)] == 0:
+                        if job.failed:
+                            print(f"  -> {job.base}: pages {sorted(job.failed)} failed; run again to retry")
+                        else:
+                            self._assemble(job)
+
+        failed = sum(len(job.failed) for job in jobs)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Done: {done} pages ({sources['text']} text layer, {sources['text+ocr']} text layer + image OCR, "
+            f"{sources['ocr']} full OCR), {failed} failed, {elapsed:.1f}s"
+        )
+        if self.cache_dir:
+            print(f"OCR cache: {cache['hits']} hits, {cache['misses']} misses")
+        return {
+            'documents': len(jobs), 'pages': done, 'failed': failed,
+            'sources': sources, 'cache': cache, 'seconds': elapsed,
+        }
+
+
+def collect_pdfs(inputs: Sequence[str]) -> List[str]:
+    """Files are used as given; directories contribute their *.pdf files (not recursive)."""
+    pdfs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            pdfs.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith('.pdf')
+            )
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Parallel, resumable OCR for exam PDFs")
+    parser.add_argument('inputs', nargs='*', default=[BANK_DIR], help="PDF files or directories")
+    parser.add_argument('-o', '--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="OCR processes (default: CPU count)")
+    parser.add_argument('--threads', type=int, default=1, help="onnxruntime threads per worker")
+    parser.add_argument('--zoom', type=float, default=2.0)
+    parser.add_argument('--strategies', default='original', help=f"comma separated: {', '.join(STRATEGIES)}")
+    parser.add_argument('--force', action='store_true', help="ignore checkpoints and existing output")
+    parser.add_argument('--no-text-layer', action='store_true', help="OCR every page, even ones with a text layer")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="OCR result cache (env OCR_CACHE_DIR)")
+    parser.add_argument('--no-cache', action='store_true', help="do not read or write the OCR cache")
+    parser.add_argument('--fuse', action='store_true', help="also write <name>_merged.json with the best reading per line")
+    args = parser.parse_args()
+
+    pipeline = OcrPipeline(
+        output_dir=args.output_dir,
+        zoom=args.zoom,
+        strategies=[s.strip() for s in args.strategies.split(',') if s.strip()],
+        workers=args.workers,
+        threads=args.threads,
+        use_text_layer=not args.no_text_layer,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        fuse=args.fuse,
+    )
+    summary = pipeline.run(collect_pdfs(args.inputs), force=args.force)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
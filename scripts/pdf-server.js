@@ -0,0 +1,228 @@
+/**
+ * PDF 轉換常駐服務
+ *
+ * 啟動一次 Node、MathJax 與 Chromium，之後所有考卷都重複使用，
+ * 不必每份考卷都重新啟動瀏覽器。只監聽本機，由 FastAPI 後端呼叫。
+ *
+ * 使用方式：
+ *   node scripts/pdf-server.js
+ *
+ * 環境變數：
+ *   PDF_SERVICE_HOST     監聽位址（預設 127.0.0.1）
+ *   PDF_SERVICE_PORT     監聽埠（預設 3100）
+ *   PDF_CONCURRENCY      同時轉換的份數（預設 2）
+ *   PDF_QUEUE_LIMIT      排隊上限，超過時回應 503（預設 100）
+ *
+ * API：
+ *   GET  /health                          → { ok, active, queued, svg_cache }
+ *   POST /render { input, output? }       → { output, ms }
+ */
+
+const http = require('http');
+const path = require('path');
+const fs = require('fs');
+
+const {
+    typesetSvg,
+    svgCache,
+    buildHtml,
+    launchBrowser,
+    renderPdf,
+    defaultOutputPath,
+} = require('./convert-to-pdf');
+
+const HOST = process.env.PDF_SERVICE_HOST || '127.0.0.1';
+const PORT = parseInt(process.env.PDF_SERVICE_PORT || '3100', 10);
+const CONCURRENCY = Math.max(1, parseInt(process.env.PDF_CONCURRENCY || '2', 10));
+const QUEUE_LIMIT = parseInt(process.env.PDF_QUEUE_LIMIT || '100', 10);
+// 佇列已滿時建議呼叫端幾秒後重試（Retry-After）
+const RETRY_AFTER = 5;
+const MAX_BODY_BYTES = 64 * 1024;
+
+// 只允許轉換 exams/ 底下的考卷
+const EXAMS_ROOT = path.resolve(__dirname, '..', 'exams');
+
+// ==================== 瀏覽器與分頁池 ====================
+
+let browserPromise = null;
+const idlePages = [];
+
+function getBrowser() {
+    if (!browserPromise) {
+        browserPromise = launchBrowser()
+            .then((browser) => {
+                browser.on('disconnected', () => {
+                    // 瀏覽器意外結束：丟掉舊分頁，下次使用時重新啟動
+                    console.error('瀏覽器已中斷，下次轉換時重新啟動');
+                    browserPromise = null;
+                    idlePages.length = 0;
+                });
+                return browser;
+            })
+            .catch((error) => {
+                browserPromise = null;
+                throw error;
+            });
+    }
+    return browserPromise;
+}
+
+async function acquirePage() {
+    const page = idlePages.pop();
+    if (page && !page.isClosed()) {
+        return page;
+    }
+    const browser = await getBrowser();
+    return browser.newPage();
+}
+
+// ==================== 併發控制 ====================
+
+let active = 0;
+const waiting = [];
+
+function acquireSlot() {
+    if (active < CONCURRENCY) {
+        active++;
+        return Promise.resolve();
+    }
+    return new Promise((resolve) => waiting.push(resolve));
+}
+
+function releaseSlot() {
+    const next = waiting.shift();
+    if (next) {
+        next();
+    } else {
+        active--;
+    }
+}
+
+async function render(inputFile, outputFile) {
+    await acquireSlot();
+    const started = Date.now();
+    let page = null;
+    try {
+        const html = buildHtml(inputFile);
+        page = await acquirePage();
+        await renderPdf(page, html, outputFile);
+        // 成功的分頁放回池中重複使用；失敗的分頁在 finally 中關閉
+        idlePages.push(page);
+        page = null;
+        return Date.now() - started;
+    } finally {
+        if (page) {
+            page.close().catch(() => {});
+        }
+        releaseSlot();
+    }
+}
+
+// ==================== HTTP ====================
+
+function sendJson(res, status, body, headers = {}) {
+    res.writeHead(status, { 'Content-Type': 'application/json; charset=utf-8', ...headers });
+    res.end(JSON.stringify(body));
+}
+
+function readBody(req) {
+    return new Promise((resolve, reject) => {
+        const chunks = [];
+        let size = 0;
+        req.on('data', (chunk) => {
+            size += chunk.length;
+            if (size > MAX_BODY_BYTES) {
+                reject(new Error('請求內容過大'));
+                req.destroy();
+                return;
+            }
+            chunks.push(chunk);
+        });
+        req.on('end', () => resolve(Buffer.concat(chunks).toString('utf-8')));
+        req.on('error', reject);
+    });
+}
+
+function resolveExamPath(file, extension) {
+    const resolved = path.resolve(file);
+    if (!resolved.startsWith(EXAMS_ROOT + path.sep)) {
+        throw new Error(`只能轉換 exams/ 底下的檔案: ${file}`);
+    }
+    // 限定副檔名，避免 output 指到 catalog.db 等其他檔案而被 PDF 覆寫
+    if (path.extname(resolved).toLowerCase() !== extension) {
+        throw new Error(`檔案必須是 ${extension}: ${file}`);
+    }
+    return resolved;
+}
+
+async function handleRender(req, res) {
+    let input;
+    let output;
+    try {
+        const body = JSON.parse(await readBody(req));
+        input = resolveExamPath(String(body.input || ''), '.md');
+        output = resolveExamPath(body.output ? String(body.output) : defaultOutputPath(input), '.pdf');
+    } catch (error) {
+        sendJson(res, 400, { error: error.message });
+        return;
+    }
+    if (!fs.existsSync(input)) {
+        sendJson(res, 404, { error: `檔案不存在: ${input}` });
+        return;
+    }
+    if (waiting.length >= QUEUE_LIMIT) {
+        sendJson(res, 503, { error: '轉換佇列已滿，請稍後再試' }, { 'Retry-After': String(RETRY_AFTER) });
+        return;
+    }
+
+    try {
+        const ms = await render(input, output);
+        console.log(`✓ ${path.basename(output)}（${ms} ms）`);
+        sendJson(res, 200, { output, ms });
+    } catch (error) {
+        console.error(`✗ ${path.basename(input)}：${error.message}`);
+        sendJson(res, 500, { error: error.message });
+    }
+}
+
+const server = http.createServer((req, res) => {
+    if (req.method === 'GET' && req.url === '/health') {
+        sendJson(res, 200, {
+            ok: true,
+            active,
+            queued: waiting.length,
+            svg_cache: { hits: svgCache.hits, misses: svgCache.misses },
+        });
+    } else if (req.method === 'POST' && req.url === '/render') {
+        handleRender(req, res);
+    } else {
+        sendJson(res, 404, { error: 'not found' });
+    }
+});
+
+async function shutdown() {
+    server.close();
+    if (browserPromise) {
+        try {
+            const browser = await browserPromise;
+            await browser.close();
+        } catch (error) {
+            // 瀏覽器已經結束
+        }
+    }
+    process.exit(0);
+}
+
+process.on('SIGTERM', shutdown);
+process.on('SIGINT', shutdown);
+
+server.listen(PORT, HOST, async () => {
+    // 先做一次 MathJax 轉換並啟動瀏覽器，讓第一份考卷不必等待
+    typesetSvg('x');
+    try {
+        await getBrowser();
+    } catch (error) {
+        console.error('瀏覽器啟動失敗（第一次轉換時會再試）：', error.message);
+    }
+    console.log(`PDF 服務已啟動：http://${HOST}:${PORT}（併發 ${CONCURRENCY}）`);
+});
@@ -0,0 +1,70 @@
+"""
+以注入的檔案 I/O 延遲啟動後端（負載測試用）
+
+對 exams/generated 底下檔案的每次 stat 與 open 先阻塞 --delay-ms 毫秒，模擬慢速磁碟或網路掛載，
+用來量測 event loop 上的阻塞 I/O 對交卷尾端延遲的影響。其他路徑不受影響。
+
+使用方式：
+    python scripts/serve_with_io_delay.py --delay-ms 2
+    EXAM_CACHE_SIZE=2 python scripts/serve_with_io_delay.py --delay-ms 2 --port 8001
+    python scripts/load_test_quiz.py --base-url http://localhost:8001 --rate 150
+"""
+
+import io
+import os
+import sys
+import time
+import builtins
+import argparse
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def install_delay(root: str, delay: float) -> None:
+    """root 底下的路徑在 stat/open 前先 sleep（阻塞呼叫的執行緒，如同真的在等磁碟）"""
+    root = os.path.realpath(root)
+    real_stat, real_open = os.stat, io.open
+
+    def slow(path) -> bool:
+        try:
+            path = os.fsdecode(path)
+        except TypeError:  # 檔案描述子
+            return False
+        return os.path.realpath(path).startswith(root)
+
+    def stat(path, *args, **kwargs):
+        if slow(path):
+            time.sleep(delay)
+        return real_stat(path, *args, **kwargs)
+
+    def open_(file, *args, **kwargs):
+        if slow(file):
+            time.sleep(delay)
+        return real_open(file, *args, **kwargs)
+
+    os.stat = stat
+    io.open = builtins.open = open_
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="以注入的檔案 I/O 延遲啟動後端")
+    parser.add_argument("--delay-ms", type=float, default=2.0, help="每次 stat/open 的延遲（毫秒）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    if args.delay_ms > 0:
+        install_delay(os.path.join(BACKEND_DIR, '..', 'exams', 'generated'), args.delay_ms / 1000)
+
+    import uvicorn
+    import main as backend
+
+    print(f"後端啟動於 http://{args.host}:{args.port}（exams/generated 每次 stat/open 延遲 {args.delay_ms:g} ms）")
+    uvicorn.run(backend.app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
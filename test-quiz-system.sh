@@ -42,11 +42,13 @@ if echo "$QUIZ_DATA" | jq -e '.exam_id' > /dev/null 2>&1; then
     TITLE=$(echo "$QUIZ_DATA" | jq -r '.title')
     SUBJECT=$(echo "$QUIZ_DATA" | jq -r '.subject')
     TOTAL=$(echo "$QUIZ_DATA" | jq -r '.total_questions')
+    SESSION_ID=$(echo "$QUIZ_DATA" | jq -r '.session_id')
     
     echo -e "${GREEN}✅ 考卷載入成功${NC}"
     echo "   標題: ${TITLE}"
     echo "   科目: ${SUBJECT}"
     echo "   題數: ${TOTAL}"
+    echo "   作答場次: ${SESSION_ID}"
     
     # 檢查是否包含答案（不應該有）
     HAS_ANSWER=$(echo "$QUIZ_DATA" | jq '.questions[0].correct_answer')
@@ -65,7 +67,7 @@ echo ""
 echo -e "${YELLOW}[3/4] 提交答案...${NC}"
 
 # 建立模擬答案（前10題全部選B）
-ANSWERS='{"exam_id":"'${EXAM_ID}'","answers":['
+ANSWERS='{"exam_id":"'${EXAM_ID}'","session_id":"'${SESSION_ID}'","answers":['
 for i in {1..10}; do
     if [ $i -gt 1 ]; then
         ANSWERS="${ANSWERS},"